@@ -0,0 +1,142 @@
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+
+from nonogram_solver import board_to_strings, invalid_puzzle, line_cache, nonogram_solver, read_puzzles
+
+### parallel batch solver
+### spreads puzzles over a pool of worker processes, sending them in chunks,
+### and yields results in input order (or as they complete) while tracking per-worker throughput
+
+worker_cache = None # line_cache kept warm by each worker process across its puzzles
+
+### set up a worker process: one line_cache shared by every puzzle it solves
+def init_worker(cache_size):
+    global worker_cache
+    worker_cache = line_cache(cache_size)
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # let the parent handle ctrl-c
+
+### solve one puzzle in a worker process. task is (index, puzzle_id, rows_hints, cols_hints, timeout)
+### where rows_hints is None and cols_hints is an error message for puzzles that couldn't be read
+def solve_task(task):
+    index, puzzle_id, rows_hints, cols_hints, timeout = task
+    result = {"index": index, "id": puzzle_id, "worker": os.getpid()}
+    if rows_hints is None:
+        result.update(status="error", error=cols_hints, elapsed=0.0)
+        return result
+
+    # the solver checks the deadline between line updates, and returns the squares determined
+    # so far once timeout seconds pass
+    start_time = time.perf_counter()
+    try:
+        ng_solver = nonogram_solver(rows_hints, cols_hints, cache=worker_cache)
+        board = ng_solver.run_solver(time_limit=timeout)
+        if ng_solver.stop_reason == "deadline":
+            status = "timeout"
+        else:
+            status = "solved" if ng_solver.is_complete() else "incomplete"
+        result.update(status=status, phase=ng_solver.phase, board=board_to_strings(board))
+        if ng_solver.stop_reason is not None:
+            result["completion"] = ng_solver.completion()
+    except invalid_puzzle as error:
+        result.update(status="error", error="invalid puzzle: " + str(error))
+    except Exception as error:
+        result.update(status="error", error=repr(error))
+    result["elapsed"] = time.perf_counter() - start_time
+    return result
+
+### process pool batch solver.
+### workers: number of processes (default: cpu count), chunksize: puzzles sent to a worker at once,
+### ordered: yield results in input order rather than as they complete,
+### timeout: seconds allowed per puzzle (None for no limit)
+class batch_solver:
+    def __init__(self, workers=None, chunksize=16, ordered=True, timeout=None, cache_size=100000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.ordered = ordered
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.worker_stats = {}
+        self.num_puzzles = 0
+        self.wall_time = 0.0
+
+    ### solve (puzzle_id, rows_hints, cols_hints) tuples from puzzles, e.g. from read_puzzles,
+    ### yielding one result dict per puzzle. at most a few chunks per worker are read ahead
+    ### of the results consumed, so memory use doesn't grow with the number of puzzles
+    def solve(self, puzzles):
+        max_pending = 4 * self.workers * self.chunksize
+        pending = threading.Semaphore(max_pending)
+        stopped = threading.Event()
+
+        def tasks():
+            for index, (puzzle_id, rows_hints, cols_hints) in enumerate(puzzles):
+                pending.acquire()
+                if stopped.is_set():
+                    return
+                yield index, puzzle_id, rows_hints, cols_hints, self.timeout
+
+        start_time = time.perf_counter()
+        pool = multiprocessing.Pool(self.workers, init_worker, (self.cache_size,))
+        try:
+            if self.ordered:
+                results = pool.imap(solve_task, tasks(), self.chunksize)
+            else:
+                results = pool.imap_unordered(solve_task, tasks(), self.chunksize)
+            for result in results:
+                pending.release()
+                self.record(result)
+                self.wall_time = time.perf_counter() - start_time
+                yield result
+            pool.close()
+        finally:
+            # wake the task feeder if it is waiting, so the pool can shut down
+            stopped.set()
+            pending.release()
+            pool.terminate()
+            pool.join()
+
+    ### add a finished puzzle to the per-worker counters
+    def record(self, result):
+        worker = self.worker_stats.setdefault(result["worker"], {"puzzles": 0, "busy_time": 0.0})
+        worker["puzzles"] += 1
+        worker["busy_time"] += result["elapsed"]
+        self.num_puzzles += 1
+
+    ### puzzles solved, busy time and puzzles per busy second for each worker, and overall throughput
+    def stats(self):
+        workers = {}
+        for pid, worker in self.worker_stats.items():
+            busy_time = worker["busy_time"]
+            workers[pid] = {"puzzles": worker["puzzles"], "busy_time": busy_time,
+                            "puzzles_per_sec": worker["puzzles"] / busy_time if busy_time else None}
+        return {"puzzles": self.num_puzzles, "wall_time": self.wall_time,
+                "puzzles_per_sec": self.num_puzzles / self.wall_time if self.wall_time else None,
+                "workers": workers}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a file of nonograms on a pool of worker processes")
+    parser.add_argument("puzzles", help='puzzle file in the --batch format of nonogram_solver.py ("-" for stdin)')
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: cpu count)")
+    parser.add_argument("--chunksize", type=int, default=16, help="puzzles sent to a worker at once")
+    parser.add_argument("--unordered", action="store_true", help="write results as they complete")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per puzzle")
+    args = parser.parse_args(argv)
+
+    solver = batch_solver(args.workers, args.chunksize, not args.unordered, args.timeout)
+    puzzle_file = sys.stdin if args.puzzles == "-" else open(args.puzzles)
+    try:
+        for result in solver.solve(read_puzzles(puzzle_file)):
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+    finally:
+        if puzzle_file is not sys.stdin:
+            puzzle_file.close()
+    sys.stderr.write(json.dumps(solver.stats()) + "\n")
+
+if __name__ == "__main__":
+    main()
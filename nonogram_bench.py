@@ -0,0 +1,168 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from nonogram_solver import nonogram_solver
+
+### benchmark harness
+### generates reproducible puzzle corpora from seeded random images, times run_solver end to end
+### and per update_line call, and compares results with a previous run to flag regressions
+
+### random image of painted (True) and unpainted (False) squares, painted with probability density
+def random_image(num_rows, num_cols, density, seed):
+    rng = random.Random(seed)
+    return [[rng.random() < density for x in range(num_cols)] for y in range(num_rows)]
+
+### hints of a single line of an image, [0] for a line with no painted squares
+def line_hints(line):
+    hints = []
+    seq_length = 0
+    for square in line:
+        if square:
+            seq_length += 1
+        elif seq_length > 0:
+            hints.append(seq_length)
+            seq_length = 0
+    if seq_length > 0:
+        hints.append(seq_length)
+    return hints or [0]
+
+### row and col hints of an image
+def image_hints(image):
+    rows_hints = [line_hints(row) for row in image]
+    cols_hints = [line_hints(col) for col in zip(*image)]
+    return rows_hints, cols_hints
+
+### corpus of square puzzles, count for each size and density. the seed of each puzzle depends
+### only on seed, size, density and its number, so corpora are the same on every machine
+def make_corpus(sizes, densities, count, seed=0):
+    corpus = []
+    for size in sizes:
+        for density in densities:
+            for i in range(count):
+                puzzle_seed = "%d-%d-%s-%d" % (seed, size, density, i)
+                rows_hints, cols_hints = image_hints(random_image(size, size, density, puzzle_seed))
+                corpus.append({"id": "%dx%d-%s-%d" % (size, size, density, i), "size": size,
+                               "density": density, "rows": rows_hints, "cols": cols_hints})
+    return corpus
+
+### nonogram_solver that times every update_line call
+class timed_solver(nonogram_solver):
+    def __init__(self, rows_hints, cols_hints, **kwargs):
+        super().__init__(rows_hints, cols_hints, **kwargs)
+        self.update_line_time = 0.0
+
+    def update_line(self):
+        start_time = time.perf_counter()
+        super().update_line()
+        self.update_line_time += time.perf_counter() - start_time
+
+### solve every puzzle in corpus, returning timings grouped by size and density. puzzles not
+### finished within time_limit seconds (None for no limit) are counted as incomplete in their
+### group and left out of its times, so the times don't depend on how long search got to run
+def run_benchmark(corpus, repeat=1, time_limit=None):
+    groups = {}
+    for puzzle in corpus:
+        key = "%dx%d-%s" % (puzzle["size"], puzzle["size"], puzzle["density"])
+        group = groups.setdefault(key, {"size": puzzle["size"], "density": puzzle["density"], "puzzles": 0,
+                                        "incomplete": 0, "solve_time": 0.0, "line_updates": 0,
+                                        "update_line_time": 0.0, "phases": {}})
+        # best of repeat runs, to reduce noise
+        best = None
+        for i in range(repeat):
+            ng_solver = timed_solver(puzzle["rows"], puzzle["cols"])
+            start_time = time.perf_counter()
+            ng_solver.run_solver(time_limit=time_limit)
+            solve_time = time.perf_counter() - start_time
+            if best is None or solve_time < best[0]:
+                best = (solve_time, ng_solver)
+        solve_time, ng_solver = best
+        group["puzzles"] += 1
+        group["phases"][ng_solver.phase] = group["phases"].get(ng_solver.phase, 0) + 1
+        if ng_solver.stop_reason is not None:
+            group["incomplete"] += 1
+            continue
+        group["solve_time"] += solve_time
+        group["line_updates"] += ng_solver.num_line_updates
+        group["update_line_time"] += ng_solver.update_line_time
+
+    for group in groups.values():
+        finished = group["puzzles"] - group["incomplete"]
+        group["mean_solve_time"] = group["solve_time"] / finished if finished else 0.0
+        if group["line_updates"]:
+            group["mean_update_line_time"] = group["update_line_time"] / group["line_updates"]
+        else:
+            group["mean_update_line_time"] = 0.0
+    return groups
+
+### groups whose mean solve time or mean update_line time grew by more than threshold (a fraction),
+### or with more incomplete puzzles than before
+def find_regressions(previous, current, threshold):
+    regressions = []
+    for key, group in current.items():
+        if key not in previous:
+            continue
+        if group["incomplete"] > previous[key].get("incomplete", 0):
+            regressions.append({"group": key, "metric": "incomplete", "previous": previous[key].get("incomplete", 0),
+                                "current": group["incomplete"]})
+        for metric in ("mean_solve_time", "mean_update_line_time"):
+            old = previous[key][metric]
+            new = group[metric]
+            if old > 0 and new > 0 and (new - old) / old > threshold:
+                regressions.append({"group": key, "metric": metric, "previous": old, "current": new,
+                                    "change": (new - old) / old})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark nonogram_solver on generated puzzles")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100], help="board sizes")
+    # sparser random images are often ambiguous at larger sizes, and leave most of the time to search
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.7, 0.75, 0.8],
+                        help="fraction of painted squares")
+    parser.add_argument("--count", type=int, default=5, help="puzzles per size and density")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed")
+    parser.add_argument("--repeat", type=int, default=1, help="time each puzzle as the best of this many runs")
+    parser.add_argument("--time-limit", type=float, default=10.0,
+                        help="seconds allowed per puzzle run before it counts as incomplete (default: 10)")
+    parser.add_argument("--output", metavar="FILE", help="write results as JSON to FILE (default: stdout)")
+    parser.add_argument("--compare", metavar="FILE", help="previous results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown counted as a regression, as a fraction (default: 0.1)")
+    parser.add_argument("--save-corpus", metavar="FILE",
+                        help="write the corpus as JSON lines, readable by nonogram_solver.py --batch")
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.sizes, args.densities, args.count, args.seed)
+    if args.save_corpus:
+        with open(args.save_corpus, "w") as corpus_file:
+            for puzzle in corpus:
+                corpus_file.write(json.dumps({"id": puzzle["id"], "rows": puzzle["rows"], "cols": puzzle["cols"]}) + "\n")
+
+    results = {"python": platform.python_version(), "seed": args.seed, "count": args.count,
+               "time_limit": args.time_limit,
+               "groups": run_benchmark(corpus, args.repeat, args.time_limit)}
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+        regressions = find_regressions(previous["groups"], results["groups"], args.threshold)
+        for regression in regressions:
+            if regression["metric"] == "incomplete":
+                sys.stderr.write("regression in %(group)s: %(previous)d -> %(current)d incomplete puzzles\n" % regression)
+                continue
+            sys.stderr.write("regression in %(group)s %(metric)s: %(previous).6f -> %(current).6f (%(change)+.1f%%)\n"
+                             % dict(regression, change=100 * regression["change"]))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import time
+
+import numpy as np
+
+from nonogram_solver import nonogram_solver, validate_hints
+
+### numpy nonogram engine
+### keeps the board as an int8 array (-1 unknown, 0 unpainted, 1 painted) and solves all rows,
+### then all cols, in batched vectorized passes of the same dynamic programming as solve_line.
+### hints are padded on the left with 0s to the same number per line, so all rows (or cols)
+### are solved with one set of array operations
+
+UNKNOWN = -1
+MEMORY_BUDGET = 64 * 2 ** 20 # default bytes of working arrays for one solve_lines call
+BYTES_PER_CELL = 40 # solve_lines peak memory per (line, square, hint + 1), measured
+
+### exact line solver for a batch of lines of the same length. lines is an (L, n) int8 array
+### and hints an (L, k) int array of hints padded on the left with 0s (see pad_hints).
+### returns the solved lines and an (L,) bool array, False for lines with no valid arrangement.
+### peak memory is about BYTES_PER_CELL * L * n * (k + 1), see numpy_solver.sweep
+def solve_lines(lines, hints):
+    num_lines, length = lines.shape
+    num_hints = hints.shape[1]
+    if num_hints == 0: # empty lines
+        consistent = (lines != 1).all(axis=1)
+        return np.zeros_like(lines), consistent
+
+    line_idx = np.arange(num_lines)[:, None]
+    hint_idx = np.arange(num_hints)[None, :]
+    not_painted = lines != 1
+
+    # padding hints are placed before the line starts: the first real hint of each line is
+    # first_hint, and padding is made too long to fit anywhere in the line
+    first_hint = (hints == 0).sum(axis=1)[:, None]
+    hints = np.where(hints == 0, length + 1, hints)
+
+    # num_unpainted[:, i] = number of known unpainted squares before square i, so a hint
+    # fits in squares [s, e) if num_unpainted[:, s] == num_unpainted[:, e]
+    num_unpainted = np.zeros((num_lines, length + 1), dtype=np.int32)
+    np.cumsum(lines == 0, axis=1, out=num_unpainted[:, 1:])
+
+    # prefix[:, i, j]: first i squares can hold exactly the first j hints
+    prefix = np.zeros((num_lines, length + 1, num_hints + 1), dtype=bool)
+    prefix[line_idx[:, 0], 0, first_hint[:, 0]] = True
+    for i in range(1, length + 1):
+        prefix[:, i, :] = not_painted[:, i - 1, None] & prefix[:, i - 1, :]
+        # hint j ends at square i-1
+        start = i - hints
+        clipped = np.maximum(start, 0)
+        before = np.maximum(clipped - 1, 0)
+        fits = (start >= 0) & (num_unpainted[line_idx, clipped] == num_unpainted[:, i, None])
+        fits_before = np.where(clipped > 0, not_painted[line_idx, before] & prefix[line_idx, before, hint_idx],
+                               hint_idx == first_hint)
+        prefix[:, i, 1:] |= fits & fits_before
+    consistent = prefix[:, length, num_hints]
+
+    # suffix[:, i, j]: squares from i onward can hold exactly hints j onward
+    suffix = np.zeros((num_lines, length + 1, num_hints + 1), dtype=bool)
+    suffix[:, length, num_hints] = True
+    for i in range(length - 1, -1, -1):
+        suffix[:, i, :] = not_painted[:, i, None] & suffix[:, i + 1, :]
+        # hint j starts at square i
+        end = i + hints
+        clipped = np.minimum(end, length)
+        after = np.minimum(clipped, length - 1)
+        fits = (end <= length) & (num_unpainted[line_idx, clipped] == num_unpainted[:, i, None])
+        fits_after = np.where(clipped < length, not_painted[line_idx, after] & suffix[line_idx, after + 1, hint_idx + 1],
+                              hint_idx + 1 == num_hints)
+        suffix[:, i, :num_hints] |= fits & fits_after
+
+    # valid placements of every hint at every start, as an (L, k, n) array
+    line_idx3 = line_idx[:, :, None]
+    hint_idx3 = hint_idx[:, :, None]
+    start = np.arange(length)[None, None, :]
+    end = start + hints[:, :, None]
+    clipped = np.minimum(end, length)
+    before = np.maximum(start - 1, 0)
+    after = np.minimum(clipped, length - 1)
+    fits = (end <= length) & (num_unpainted[line_idx3, clipped] == num_unpainted[:, None, :length])
+    fits_before = np.where(start > 0, not_painted[line_idx3, before] & prefix[line_idx3, before, hint_idx3],
+                           hint_idx3 == first_hint[:, :, None])
+    fits_after = np.where(clipped < length, not_painted[line_idx3, after] & suffix[line_idx3, after + 1, hint_idx3 + 1],
+                          hint_idx3 + 1 == num_hints)
+    valid = fits & fits_before & fits_after
+
+    # squares covered by a valid placement may be painted (difference array over placements)
+    num_placements = np.zeros((num_lines, length + 1), dtype=np.int32)
+    num_placements[:, :length] += valid.sum(axis=1)
+    valid_lines, valid_hints, valid_starts = np.nonzero(valid)
+    np.add.at(num_placements, (valid_lines, clipped[valid_lines, valid_hints, valid_starts]), -1)
+    can_paint = np.cumsum(num_placements, axis=1)[:, :length] > 0
+
+    # squares between the same hint index from both sides may be unpainted
+    can_unpaint = not_painted & (prefix[:, :length, :] & suffix[:, 1:, :]).any(axis=2)
+
+    solved_lines = lines.copy()
+    unknown = lines == UNKNOWN
+    solved_lines[unknown & can_paint & ~can_unpaint] = 1
+    solved_lines[unknown & can_unpaint & ~can_paint] = 0
+    return solved_lines, consistent
+
+### (L, k) array of the (nonzero) hints of each line, padded on the left with 0s
+def pad_hints(lines_hints):
+    lines_hints = [[hint for hint in line_hints if hint > 0] for line_hints in lines_hints]
+    num_hints = max([len(line_hints) for line_hints in lines_hints] + [0])
+    padded_hints = np.zeros((len(lines_hints), num_hints), dtype=np.int64)
+    for i, line_hints in enumerate(lines_hints):
+        if line_hints:
+            padded_hints[i, num_hints - len(line_hints):] = line_hints
+    return padded_hints
+
+### nonogram solver running line logic as batched numpy sweeps over all rows, then all cols.
+### each batch is split so solve_lines stays within about memory_budget bytes.
+### if the board is still incomplete, probing and search are left to nonogram_solver,
+### which is created with solver_options (e.g. cache, stats)
+class numpy_solver:
+    def __init__(self, rows_hints, cols_hints, memory_budget=MEMORY_BUDGET, **solver_options):
+        validate_hints(rows_hints, cols_hints)
+        self.memory_budget = memory_budget
+        self.size = (len(rows_hints), len(cols_hints))
+        self.rows_hints = rows_hints
+        self.cols_hints = cols_hints
+        self.solver_options = solver_options
+        self.board = np.full(self.size, UNKNOWN, dtype=np.int8)
+        self.rows_padded_hints = pad_hints(rows_hints)
+        self.cols_padded_hints = pad_hints(cols_hints)
+        self.phase = None
+        self.stop_reason = None
+        self.num_sweeps = 0
+
+    ### solve every dirty line of lines (the board, or its transpose for cols), in as few batches
+    ### as memory_budget allows. returns a bool array of changed squares, or None if a line has
+    ### no valid arrangement
+    def sweep(self, lines, padded_hints, dirty):
+        changed = np.zeros(lines.shape, dtype=bool)
+        indices = np.nonzero(dirty)[0]
+        if len(indices) == 0:
+            return changed
+        hints = padded_hints[indices]
+        # drop padding columns that no selected line needs
+        num_hints = int((hints > 0).sum(axis=1).max())
+        hints = hints[:, hints.shape[1] - num_hints:]
+        chunk_size = max(self.memory_budget // (BYTES_PER_CELL * lines.shape[1] * (num_hints + 1)), 1)
+        for start in range(0, len(indices), chunk_size):
+            chunk = indices[start:start + chunk_size]
+            old_lines = lines[chunk]
+            solved_lines, consistent = solve_lines(old_lines, hints[start:start + chunk_size])
+            if not consistent.all():
+                return None
+            lines[chunk] = solved_lines
+            changed[chunk] = solved_lines != old_lines
+        self.num_sweeps += 1
+        return changed
+
+    ### run line logic until no line changes, then probing and search if needed (see
+    ### nonogram_solver.run_solver, also for time_limit, max_passes and cancel; a pass here is
+    ### a row sweep and a col sweep). returns the board as a list of rows of None, True and False
+    def run_solver(self, search=True, time_limit=None, max_passes=None, cancel=None):
+        start_time = time.perf_counter()
+        self.stop_reason = None
+        dirty_rows = np.ones(self.size[0], dtype=bool)
+        dirty_cols = np.ones(self.size[1], dtype=bool)
+        num_passes = 0
+        while dirty_rows.any() or dirty_cols.any():
+            if cancel is not None and cancel.is_set():
+                self.stop_reason = "cancelled"
+            elif time_limit is not None and time.perf_counter() - start_time >= time_limit:
+                self.stop_reason = "deadline"
+            elif max_passes is not None and num_passes >= max_passes:
+                self.stop_reason = "max_passes"
+            if self.stop_reason is not None:
+                self.phase = "incomplete"
+                return self.to_lists()
+            num_passes += 1
+            changed = self.sweep(self.board, self.rows_padded_hints, dirty_rows)
+            if changed is None:
+                self.phase = "unsolvable"
+                return self.to_lists()
+            dirty_rows[:] = False
+            dirty_cols |= changed.any(axis=0)
+
+            changed = self.sweep(self.board.T, self.cols_padded_hints, dirty_cols)
+            if changed is None:
+                self.phase = "unsolvable"
+                return self.to_lists()
+            dirty_cols[:] = False
+            dirty_rows |= changed.any(axis=0)
+
+        if self.is_complete():
+            self.phase = "lines"
+        elif not search:
+            self.phase = "incomplete"
+        else:
+            # continue from the current board with nonogram_solver's probing and search
+            ng_solver = nonogram_solver(self.rows_hints, self.cols_hints, **self.solver_options)
+            for row, col in zip(*np.nonzero(self.board != UNKNOWN)):
+                ng_solver.board.set(int(row), int(col), bool(self.board[row, col]))
+            if time_limit is not None:
+                time_limit = max(time_limit - (time.perf_counter() - start_time), 0)
+            if max_passes is not None:
+                max_passes -= num_passes
+            board = ng_solver.run_solver(True, time_limit, max_passes, cancel)
+            self.phase = ng_solver.phase
+            self.stop_reason = ng_solver.stop_reason
+            for row in range(self.size[0]):
+                for col in range(self.size[1]):
+                    if board[row][col] != None:
+                        self.board[row, col] = board[row][col]
+        return self.to_lists()
+
+    def is_complete(self):
+        return not (self.board == UNKNOWN).any()
+
+    ### percentage of squares determined so far
+    def completion(self):
+        return 100.0 * (self.board != UNKNOWN).sum() / self.board.size
+
+    def to_lists(self):
+        return [[None if square == UNKNOWN else bool(square) for square in row] for row in self.board.tolist()]
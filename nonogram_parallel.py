@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+from nonogram_solver import nonogram_solver, solve_line, validate_hints
+
+### parallel sweeps within a single puzzle
+### the board lives in shared memory, one byte per square (0 unknown, 1 painted, 2 unpainted).
+### all dirty rows are solved across a pool of worker processes, then all dirty cols: lines in the
+### same phase share no squares, so workers write their lines in place, and the wait for every
+### worker between phases merges the board
+
+UNKNOWN = 0
+PAINTED = 1
+UNPAINTED = 2
+SQUARE_CODES = {None: UNKNOWN, True: PAINTED, False: UNPAINTED}
+SQUARE_VALUES = (None, True, False)
+
+worker_memory = None # shared board, attached once per worker process
+worker_puzzle = None # (size, rows_hints, cols_hints)
+
+### attach a worker process to the shared board of the puzzle
+def init_worker(memory_name, size, rows_hints, cols_hints):
+    global worker_memory, worker_puzzle
+    worker_memory = shared_memory.SharedMemory(name=memory_name)
+    worker_puzzle = (size, rows_hints, cols_hints)
+
+### squares of a row or col of the shared board, as a writable memoryview
+def board_line(buf, size, is_row, line_idx):
+    if is_row:
+        return buf[line_idx * size[1]:(line_idx + 1) * size[1]]
+    return buf[line_idx:size[0] * size[1]:size[1]]
+
+### solve some lines of one phase in a worker, writing solved squares straight to the shared board.
+### returns the indices of crossing lines with changed squares, or None on a contradiction
+def solve_chunk(task):
+    is_row, line_indices = task
+    size, rows_hints, cols_hints = worker_puzzle
+    lines_hints = rows_hints if is_row else cols_hints
+    buf = worker_memory.buf
+    changed_crossings = set()
+    for line_idx in line_indices:
+        squares = board_line(buf, size, is_row, line_idx)
+        line = [SQUARE_VALUES[code] for code in squares.tolist()]
+        solved_line = solve_line(lines_hints[line_idx], line)
+        if solved_line is None:
+            return None
+        for i in range(len(line)):
+            if line[i] != solved_line[i]:
+                squares[i] = SQUARE_CODES[solved_line[i]]
+                changed_crossings.add(i)
+    return changed_crossings
+
+### nonogram solver running each row phase and col phase of line logic across a pool of worker
+### processes over a shared-memory board, for single puzzles too large for one core.
+### workers defaults to the cpu count. if the board is still incomplete, probing and search are
+### left to nonogram_solver, which is created with solver_options (e.g. cache, stats)
+class parallel_solver:
+    def __init__(self, rows_hints, cols_hints, workers=None, **solver_options):
+        validate_hints(rows_hints, cols_hints)
+        self.size = (len(rows_hints), len(cols_hints))
+        self.rows_hints = rows_hints
+        self.cols_hints = cols_hints
+        self.workers = workers or os.cpu_count() or 1
+        self.solver_options = solver_options
+        self.board = bytearray(self.size[0] * self.size[1])
+        self.phase = None
+        self.stop_reason = None
+        self.num_sweeps = 0
+        self.num_passes = 0
+
+    ### solve the dirty lines of one phase across the pool. returns the crossing lines
+    ### to solve in the next phase, or None on a contradiction
+    def sweep(self, pool, is_row, dirty):
+        dirty = sorted(dirty)
+        num_chunks = min(len(dirty), 4 * self.workers) # several chunks per worker to balance load
+        chunks = [(is_row, dirty[i::num_chunks]) for i in range(num_chunks)]
+        next_dirty = set()
+        for changed_crossings in pool.imap_unordered(solve_chunk, chunks):
+            if changed_crossings is None:
+                return None
+            next_dirty |= changed_crossings
+        self.num_sweeps += 1
+        return next_dirty
+
+    ### run line logic until no line changes, then probing and search if needed (see
+    ### nonogram_solver.run_solver, also for time_limit, max_passes and cancel; a pass here is
+    ### a row phase and a col phase). returns the board as a list of rows of None, True and False
+    def run_solver(self, search=True, time_limit=None, max_passes=None, cancel=None):
+        start_time = time.perf_counter()
+        self.stop_reason = None
+        self.num_passes = 0
+        memory = shared_memory.SharedMemory(create=True, size=max(len(self.board), 1))
+        try:
+            memory.buf[:len(self.board)] = self.board
+            pool = multiprocessing.Pool(self.workers, init_worker,
+                                        (memory.name, self.size, self.rows_hints, self.cols_hints))
+            try:
+                is_consistent = self.propagate(pool, start_time, time_limit, max_passes, cancel)
+            finally:
+                pool.terminate()
+                pool.join()
+            self.board[:] = memory.buf[:len(self.board)]
+        finally:
+            memory.close()
+            memory.unlink()
+
+        if self.stop_reason is not None:
+            self.phase = "incomplete"
+        elif not is_consistent:
+            self.phase = "unsolvable"
+        elif self.is_complete():
+            self.phase = "lines"
+        elif not search:
+            self.phase = "incomplete"
+        else:
+            # continue from the current board with nonogram_solver's probing and search
+            ng_solver = nonogram_solver(self.rows_hints, self.cols_hints, **self.solver_options)
+            board = self.to_lists()
+            for row in range(self.size[0]):
+                for col in range(self.size[1]):
+                    if board[row][col] != None:
+                        ng_solver.board.set(row, col, board[row][col])
+            if time_limit is not None:
+                time_limit = max(time_limit - (time.perf_counter() - start_time), 0)
+            if max_passes is not None:
+                max_passes -= self.num_passes
+            board = ng_solver.run_solver(True, time_limit, max_passes, cancel)
+            self.phase = ng_solver.phase
+            self.stop_reason = ng_solver.stop_reason
+            for row in range(self.size[0]):
+                for col in range(self.size[1]):
+                    self.board[row * self.size[1] + col] = SQUARE_CODES[board[row][col]]
+        return self.to_lists()
+
+    ### alternate row and col phases until no line changes. returns False on a contradiction,
+    ### or if stopped by time_limit, max_passes or cancel (with self.stop_reason set)
+    def propagate(self, pool, start_time, time_limit, max_passes, cancel):
+        dirty_rows = set(range(self.size[0]))
+        dirty_cols = set(range(self.size[1]))
+        while dirty_rows or dirty_cols:
+            if cancel is not None and cancel.is_set():
+                self.stop_reason = "cancelled"
+            elif time_limit is not None and time.perf_counter() - start_time >= time_limit:
+                self.stop_reason = "deadline"
+            elif max_passes is not None and self.num_passes >= max_passes:
+                self.stop_reason = "max_passes"
+            if self.stop_reason is not None:
+                return False
+            self.num_passes += 1
+            if dirty_rows:
+                changed = self.sweep(pool, True, dirty_rows)
+                if changed is None:
+                    return False
+                dirty_rows = set()
+                dirty_cols |= changed
+            if dirty_cols:
+                changed = self.sweep(pool, False, dirty_cols)
+                if changed is None:
+                    return False
+                dirty_cols = set()
+                dirty_rows |= changed
+        return True
+
+    def is_complete(self):
+        return UNKNOWN not in self.board
+
+    ### percentage of squares determined so far
+    def completion(self):
+        return 100.0 * (len(self.board) - self.board.count(UNKNOWN)) / len(self.board)
+
+    def to_lists(self):
+        num_cols = self.size[1]
+        return [[SQUARE_VALUES[code] for code in self.board[row * num_cols:(row + 1) * num_cols]]
+                for row in range(self.size[0])]
@@ -0,0 +1,161 @@
+import argparse
+import collections
+import json
+import math
+import multiprocessing
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+from nonogram_batch import init_worker, solve_task
+
+### long-lived solver server
+### answers puzzles sent as JSON lines over a unix domain socket or stdin, one response line per
+### request line. puzzles are solved on a pool of worker processes that stay up between requests,
+### so each keeps its line_cache warm, and a stats request reports request latency percentiles
+
+LATENCY_WINDOW = 10000 # latest requests kept for latency percentiles
+
+### resident solver for many clients. workers: number of processes (default: cpu count),
+### max_pending: puzzles being solved or waiting for a worker at once (default: 2 per worker),
+### beyond which clients aren't read from until a puzzle finishes, time_limit: default seconds
+### allowed per puzzle (None for no limit, a request may set its own "time_limit").
+### requests are {"id": ..., "rows": [[...], ...], "cols": [[...], ...]}, answered like
+### nonogram_batch results, or {"cmd": "stats"}
+class solver_server:
+    def __init__(self, workers=None, max_pending=None, cache_size=100000, time_limit=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.time_limit = time_limit
+        self.pending = threading.Semaphore(self.max_pending)
+        self.pool = multiprocessing.Pool(self.workers, init_worker, (cache_size,))
+        self.lock = threading.Lock() # guards the counters below, updated by every client thread
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.statuses = collections.Counter()
+        self.num_requests = 0
+        self.num_pending = 0
+        self.start_time = time.perf_counter()
+
+    ### answer one request line with a response dict
+    def handle(self, text):
+        start_time = time.perf_counter()
+        try:
+            request = json.loads(text)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            if "cmd" in request:
+                if request["cmd"] == "stats":
+                    return {"stats": self.stats()}
+                raise ValueError("unknown cmd: %r" % (request["cmd"],))
+            rows_hints, cols_hints = request["rows"], request["cols"]
+        except (ValueError, KeyError) as error:
+            response = {"status": "error", "error": "invalid request: " + repr(error)}
+            self.record(response, start_time)
+            return response
+
+        with self.lock:
+            index = self.num_requests
+            self.num_requests += 1
+        # wait for a free slot first, so a busy server stops reading new requests
+        with self.pending:
+            with self.lock:
+                self.num_pending += 1
+            try:
+                response = self.pool.apply(solve_task, ((index, request.get("id", index), rows_hints, cols_hints,
+                                                         request.get("time_limit", self.time_limit)),))
+            finally:
+                with self.lock:
+                    self.num_pending -= 1
+        del response["index"]
+        self.record(response, start_time)
+        return response
+
+    ### add an answered request to the latency window and status counts
+    def record(self, response, start_time):
+        with self.lock:
+            self.latencies.append(time.perf_counter() - start_time)
+            self.statuses[response["status"]] += 1
+
+    ### requests answered by status, puzzles in progress, uptime and latency percentiles
+    ### in seconds over the latest LATENCY_WINDOW requests
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            statuses = dict(self.statuses)
+            num_pending = self.num_pending
+        percentiles = {}
+        if latencies:
+            for percentile in (50, 90, 99): # nearest rank
+                rank = math.ceil(len(latencies) * percentile / 100)
+                percentiles["p%d" % percentile] = latencies[max(rank - 1, 0)]
+            percentiles["max"] = latencies[-1]
+        return {"requests": sum(statuses.values()), "statuses": statuses, "pending": num_pending,
+                "max_pending": self.max_pending, "workers": self.workers,
+                "uptime": time.perf_counter() - self.start_time, "latency": percentiles}
+
+    ### answer request lines from in_file on out_file until in_file ends. each client is served
+    ### by one thread, one request at a time, so responses come back in request order
+    def serve_lines(self, in_file, out_file):
+        for text in in_file:
+            text = text.strip()
+            if not text:
+                continue
+            out_file.write(json.dumps(self.handle(text)) + "\n")
+            out_file.flush()
+
+    ### serve clients connecting to a unix domain socket at path until interrupted
+    def serve_unix(self, path):
+        server = self
+
+        class client_handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                in_file = self.connection.makefile("r", encoding="utf-8")
+                out_file = self.connection.makefile("w", encoding="utf-8")
+                try:
+                    server.serve_lines(in_file, out_file)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # client went away
+                finally:
+                    in_file.close()
+                    out_file.close()
+
+        if os.path.exists(path):
+            os.unlink(path)
+        unix_server = socketserver.ThreadingUnixStreamServer(path, client_handler)
+        unix_server.daemon_threads = True
+        try:
+            unix_server.serve_forever()
+        finally:
+            unix_server.server_close()
+            os.unlink(path)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve nonogram solutions to JSON line requests")
+    parser.add_argument("--socket", metavar="PATH", help="listen on a unix domain socket (default: stdin/stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: cpu count)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="puzzles in progress at once before clients wait (default: 2 per worker)")
+    parser.add_argument("--time-limit", type=float, default=None, help="default seconds allowed per puzzle")
+    args = parser.parse_args(argv)
+
+    server = solver_server(args.workers, args.max_pending, time_limit=args.time_limit)
+    signal.signal(signal.SIGTERM, signal.default_int_handler) # shut down cleanly, removing the socket
+    try:
+        if args.socket:
+            server.serve_unix(args.socket)
+        else:
+            server.serve_lines(sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,119 @@
-import copy
+import argparse
+import collections
+import collections.abc
+import heapq
+import json
+import os
+import signal
+import sys
+import time
+
+KERNEL_RETRY_PASSES = 4 # passes line_kernel stays off before its yield is measured again
+GENERIC_COST = 10 # cost of eliminate_generic and paint_generic per square, in line_kernel calls per square (measured)
 
 ### nonogram solver
 ### uses row and col hints to automatically solve a nonogram puzzle
+### board_type selects the board backend, list_board by default: a class with get, set, line, masks,
+### count_unknown and to_lists methods.
+### cache is an optional line_cache and stats an optional solver_stats, both may be shared between solvers.
+### adaptive picks the rules run on each line from their measured cost and yield (see update_line_adaptive).
+### track_provenance records which line update set each square, so update_hints can redo only the
+### deductions an edit affects. otherwise it is turned on by the first update_hints.
+### raises invalid_puzzle for hints that can't describe any board (see validate_hints)
 class nonogram_solver:
-    def __init__(self, rows_hints, cols_hints):
+    def __init__(self, rows_hints, cols_hints, board_type=None, cache=None, stats=None, adaptive=True,
+                 track_provenance=False):
+        validate_hints(rows_hints, cols_hints)
         self.size = (len(rows_hints), len(cols_hints))
         self.rows_hints = rows_hints 
         self.cols_hints = cols_hints
-        self.board = [[None for x in range(len(cols_hints))] for y in range(len(rows_hints))]
-        self.moves = 0
+        if board_type is None:
+            board_type = list_board
+        self.board = board_type(len(rows_hints), len(cols_hints))
+        # (time, is_row, line_idx) of the line update that set each square during line logic,
+        # where time is self.moves after the square was set, or None if not tracked. used by update_hints
+        self.provenance = None
+        if track_provenance:
+            self.provenance = [[None for x in range(len(cols_hints))] for y in range(len(rows_hints))]
+        self.cache = cache
+        self.updated_masks = {} # (is_row, line_idx) -> board.masks of the line after its last update
+        self.stats = stats
+        self.moves = 0 # number of squares set
+        self.passes = 0
+        self.trail = None # squares set since search started, to be undone on backtracking
+        self.exact_only = False
+        self.contradiction = False
+        self.phase = None
+        self.deadline = None # perf_counter time to stop at, see run_solver
+        self.max_passes = None
+        self.cancel = None
+        self.stop_reason = None
+        self.stage = None # "lines", "probing" or "search", the stage of the solve in progress
+        self.probe_mark = None # trail length before the probe in progress
+        self.provenance_complete = True # False once squares are set without provenance
+        self.checkpoint_path = None # see enable_checkpoints
+        self.checkpoint_interval = None
+        self.next_checkpoint = None
+        self.checkpoint_due = False
+        self.checkpoint_info = {} # extra JSON-serializable fields saved in checkpoints, e.g. batch_index
+        self.adaptive = adaptive
+        self.kernel_enabled = True # run line_kernel in the current pass
+        self.kernel_off_passes = 0 # passes in a row with line_kernel off
+        # squares set and cost (squares scanned, see update_line_adaptive) of line_kernel and of the
+        # generic functions in the current pass
+        self.kernel_squares = 0
+        self.kernel_cost = 0
+        self.generic_squares = 0
+        self.generic_cost = 0
+        self.choices = collections.Counter() # how often each adaptive choice was made, see choose
+
+    ### set square i of the current line, keeping the board and the working line in sync
+    ### and recording which squares changed so crossing lines can be queued.
+    ### overwriting a known square with the opposite value is a contradiction
+    def set_square(self, i, value):
+        if self.line[i] == value:
+            return
+        if self.line[i] != None:
+            self.contradiction = True
+            return
+        if self.is_row:
+            row, col = self.line_idx, i
+        else:
+            row, col = i, self.line_idx
+        self.board.set(row, col, value)
+        self.line[i] = value
+        self.changed_squares.append(i)
+        self.moves += 1
+        if self.trail is not None:
+            self.trail.append((row, col))
+        elif self.provenance is not None:
+            self.provenance[row][col] = (self.moves, self.is_row, self.line_idx)
 
-    ### obtain continuous sequences of true (known painted), false (known unpainted), and none (unknown) 
+    ### obtain continuous sequences of true (known painted), false (known unpainted), and none (unknown)
+    ### squares of the current line. the sequences are kept until a square is set (self.moves changes),
+    ### so rules that set nothing don't cause the line to be scanned again
     def update_sequences(self):
+        if self.sequences_moves == self.moves:
+            return
+        self.sequences_moves = self.moves
         self.seq_lengths = [] # length of each sequence
-        self.seq_types = [] # type of each sequence 
-        seq_iter = 0
-        prev_type = None
-        for i in range(self.line_length):
-
-            # compare types of subsequent squares
-            if self.is_row:
-                cur_type = self.board[self.line_idx][i]
-                is_match = cur_type == prev_type or (cur_type is None and prev_type is None)
-                prev_type = cur_type
-            else:
-                cur_type = self.board[i][self.line_idx]
-                is_match = cur_type == prev_type or (cur_type is None and prev_type is None)
-                prev_type = cur_type
-
-            # update seq_types and seq_lengths
-            if i == 0:
-                self.seq_types.append(prev_type)
-                self.seq_lengths.append(1)
-            elif is_match:
-                self.seq_lengths[seq_iter] += 1
+        self.seq_types = [] # type of each sequence
+        prev_type = 0 # matches no square
+        for cur_type in self.line:
+            if cur_type is prev_type:
+                self.seq_lengths[-1] += 1
             else:
-                self.seq_types.append(prev_type)
+                self.seq_types.append(cur_type)
                 self.seq_lengths.append(1)
-                seq_iter += 1
+                prev_type = cur_type
 
     ### determine remaining section of line (row or col) and hints that still need to be checked
-    ### i.e. ignore known unpainted squares and completed hints on ends/edges of lines
+    ### i.e. ignore known unpainted squares and completed hints on ends/edges of lines.
+    ### like the sequences, only recomputed after a square is set
     def update_edges(self):
+        if self.edges_moves == self.moves:
+            return
+        self.edges_moves = self.moves
 
         # left or top edge
         self.min_hints_idx = 0
@@ -86,10 +158,7 @@ class nonogram_solver:
         for i in range(self.min_hints_idx, self.max_hints_idx + 1):
             if self.line_hints[i] > num_unaccounted_squares: 
                 for j in range(start_idx, start_idx + (self.line_hints[i] - num_unaccounted_squares)):
-                    if self.is_row:
-                        self.board[self.line_idx][j] = True
-                    else:
-                        self.board[j][self.line_idx] = True
+                    self.set_square(j, True)
             start_idx += 1 + self.line_hints[i]
 
     ### eliminate edges that aren't long enough to contain first or last hints 
@@ -104,10 +173,7 @@ class nonogram_solver:
             elif self.seq_types[i] == None and self.seq_types[i + 1] == False:
                 if self.seq_lengths[i] < self.line_hints[0]: # not enough space for first hint
                     for j in range(start_idx, start_idx + self.seq_lengths[i]):
-                        if self.is_row:
-                            self.board[self.line_idx][j] = False
-                        else:
-                            self.board[j][self.line_idx] = False
+                        self.set_square(j, False)
                 else:
                     break
             start_idx += self.seq_lengths[i]
@@ -120,10 +186,9 @@ class nonogram_solver:
             elif self.seq_types[i] == None and self.seq_types[i - 1] == False:
                 if self.seq_lengths[i] < self.line_hints[len(self.line_hints) - 1]: # not enough space for last hint
                     for j in range(start_idx, start_idx - self.seq_lengths[i], -1):
-                        if self.is_row:
-                            self.board[self.line_idx][j] = False
-                        else:
-                            self.board[j][self.line_idx] = False
+                        self.set_square(j, False)
+                else:
+                    break
             start_idx -= self.seq_lengths[i]
 
     ### "pull" or eliminate edges that can't contain first or last hints and
@@ -152,17 +217,11 @@ class nonogram_solver:
             if first_paint_idx == max_min_trigger_idx:
                 # pull edge
                 for i in range(self.min_line_idx, self.min_line_idx + num_first_paint):
-                    if self.is_row:
-                        self.board[self.line_idx][i] = False
-                    else:
-                        self.board[i][self.line_idx] = False
+                    self.set_square(i, False)
             if first_paint_idx < max_min_trigger_idx - 1: 
                 # push paint
                 for i in range(first_paint_idx, max_min_trigger_idx):
-                    if self.is_row:
-                        self.board[self.line_idx][i] = True
-                    else:
-                        self.board[i][self.line_idx] = True
+                    self.set_square(i, True)
 
         # right or bottom edge
         min_max_trigger_idx = self.max_line_idx - self.line_hints[self.max_hints_idx] # min index for pull/push effects at right/bottom (max) edge
@@ -185,17 +244,11 @@ class nonogram_solver:
             if first_paint_idx == min_max_trigger_idx: 
                 # pull edge
                 for i in range(self.max_line_idx, self.max_line_idx - num_first_paint, -1):
-                    if self.is_row:
-                        self.board[self.line_idx][i] = False
-                    else:
-                        self.board[i][self.line_idx] = False
+                    self.set_square(i, False)
             if first_paint_idx > min_max_trigger_idx + 1: 
                 # pull edge
                 for i in range(first_paint_idx, min_max_trigger_idx, -1):
-                    if self.is_row:
-                        self.board[self.line_idx][i] = True
-                    else:
-                        self.board[i][self.line_idx] = True
+                    self.set_square(i, True)
 
     ### interrupt completed hints with unpainted squares
     def interrupt_completed_hints(self):
@@ -212,10 +265,7 @@ class nonogram_solver:
                     # eliminate square following completed paint sequence
                     line_hints_idx += 1
                     if other_line_idx < self.line_length:
-                        if self.is_row:
-                            self.board[self.line_idx][other_line_idx] = False
-                        else:
-                            self.board[other_line_idx][self.line_idx] = False
+                        self.set_square(other_line_idx, False)
                 else: # current paint sequence is incomplete
                     break
 
@@ -231,120 +281,41 @@ class nonogram_solver:
                     # eliminate square following completed paint sequence
                     line_hints_idx -= 1
                     if other_line_idx >= 0:
-                        if self.is_row:
-                            self.board[self.line_idx][other_line_idx] = False
-                        else:
-                            self.board[other_line_idx][self.line_idx] = False
+                        self.set_square(other_line_idx, False)
                 else: # current paint sequence is incomplete
                     break
     
-    ### helper function for eliminate_generic and paint_generic. 
-    ### attempts to find a valid solution for the given test_line, which
-    ### contains one assumed value. 
-    ### returns True once a valid solution is found, or False if all attempts fail
-    def test_validity(self, test_line, start_idx=0, line_hints_idx=0):
-
-        # test hint in all squares in line starting at start_idx
-        for i in range(start_idx, self.line_length):
-            copy_test_line = copy.deepcopy(test_line)
-            hint = self.line_hints[line_hints_idx]
-            is_valid = True
-            # test if hint fits here
-            for j in range(i, i + hint):
-                if j >= self.line_length:
-                    is_valid = False
-                    break
-                if copy_test_line[j] == None:
-                    copy_test_line[j] = True
-                elif copy_test_line[j] == False:
-                    is_valid = False
-                    break
-
-            if not is_valid: # try again with successive placement of hint
-                continue
-            elif line_hints_idx < len(self.line_hints) - 1:
-                # recursively attempt to fit all hints in test_line
-                is_valid = self.test_validity(copy_test_line, i + hint + 1, line_hints_idx + 1)
-                if is_valid:
-                    return True
-            else:
-                # check for false positive: painted sequences should match hints 
-                painted_seq_len = 0
-                cur_hints_idx = 0
-                for j in range(self.line_length):
-                    if copy_test_line[j]:
-                        painted_seq_len += 1
-                    elif (copy_test_line[j] == False or copy_test_line[j] == None) \
-                            and painted_seq_len > 0:
-                        if cur_hints_idx >= len(self.line_hints):
-                            is_valid = False
-                            break
-                        if painted_seq_len != self.line_hints[cur_hints_idx]:
-                            is_valid = False
-                            break
-                        else:
-                            cur_hints_idx += 1
-                        painted_seq_len = 0
-
-                # edge case
-                if cur_hints_idx >= len(self.line_hints) and painted_seq_len > 0:
-                    is_valid = False
-                if (cur_hints_idx < len(self.line_hints) and painted_seq_len != self.line_hints[cur_hints_idx]) \
-                        or cur_hints_idx < len(self.line_hints) - 1:
-                    is_valid = False
-                if is_valid:
-                    return True
-        return False # no valid solution found after all possible attempts
-
-    ### generic elimination function. assumes unknown squares are painted and calls 
-    ### test_validity, searching for a contradiction. if one is found, eliminate square.
-    ### combined with paint_generic is sufficient to complete puzzle (inefficiently)
+    ### generic elimination function. eliminates unknown squares that cannot be painted
+    ### in any valid arrangement of the hints, as found by solve_line.
+    ### combined with paint_generic is sufficient to complete puzzle
     def eliminate_generic(self):
-        invalid_indices = []
+        line = self.line
+        self.generic_line = solve_line(self.line_hints, line)
+        if self.generic_line is None: # no valid arrangement of hints
+            self.contradiction = True
+            return
 
-        # test "True" hypothesis for unknown squares in line
+        # eliminate squares that are unpainted in every valid arrangement
         for i in range(self.line_length):
-            if self.is_row:
-                test_line = copy.deepcopy(self.board[self.line_idx])
-            else:
-                test_line = copy.deepcopy([self.board[g][self.line_idx] for g in range(len(self.board))])
-            if test_line[i] == None: 
-                test_line[i] = True
-                is_valid = self.test_validity(test_line)
-                if not is_valid:
-                    invalid_indices.append(i)
-
-        # eliminate squares that resulted in a contradiction with "True" test
-        for i in invalid_indices:
-            if self.is_row:
-                self.board[self.line_idx][i] = False
-            else:
-                self.board[i][self.line_idx] = False
+            if line[i] == None and self.generic_line[i] == False:
+                self.set_square(i, False)
 
-    ### generic painting function. assumes unknown squares are unpainted and calls 
-    ### test_validity, searching for a contradiction. if one is found, paint square.
-    ### combined with eliminate_generic is sufficient to complete puzzle (inefficiently)
+    ### generic painting function. paints unknown squares that are painted
+    ### in every valid arrangement of the hints, as found by solve_line.
+    ### combined with eliminate_generic is sufficient to complete puzzle
     def paint_generic(self):
-        invalid_indices = []
+        line = self.line
+        # eliminating squares doesn't change the set of valid arrangements,
+        # so the result of eliminate_generic on this line can be reused
+        if self.generic_line is None:
+            self.generic_line = solve_line(self.line_hints, line)
+            if self.generic_line is None:
+                return
 
-        # test "False" hypothesis for unknown squares in line
+        # paint squares that are painted in every valid arrangement
         for i in range(self.line_length):
-            if self.is_row:
-                test_line = copy.deepcopy(self.board[self.line_idx])
-            else:
-                test_line = copy.deepcopy([self.board[g][self.line_idx] for g in range(len(self.board))])
-            if test_line[i] == None:
-                test_line[i] = False
-                is_valid = self.test_validity(test_line)
-                if not is_valid:
-                    invalid_indices.append(i)
-
-        # paint squares that resulted in a contradiction with "False" test
-        for i in invalid_indices:
-            if self.is_row:
-                self.board[self.line_idx][i] = True
-            else:
-                self.board[i][self.line_idx] = True
+            if line[i] == None and self.generic_line[i]:
+                self.set_square(i, True)
 
     ### if all hints are satisfied, and thus the line is completed,
     ### eliminate remaining unknown squares
@@ -370,168 +341,1202 @@ class nonogram_solver:
         if is_complete:
             # eliminate remaining unknown squares in line
             for i in range(self.line_length):
-                if self.is_row:
-                    if self.board[self.line_idx][i] == None:
-                        self.board[self.line_idx][i] = False
-                else:
-                    if self.board[i][self.line_idx] == None:
-                        self.board[i][self.line_idx] = False
+                if self.line[i] == None:
+                    self.set_square(i, False)
 
-    ### print current state of board 
-    def print_board(self):
-        max_num_col_hints = 0
-        max_num_row_hints = 0
-        for i in range(self.size[1]):
-            if len(self.cols_hints[i]) > max_num_col_hints:
-                max_num_col_hints = len(self.cols_hints[i])
-        for i in range(self.size[0]):
-            if len(self.rows_hints[i]) > max_num_row_hints:
-                max_num_row_hints = len(self.rows_hints[i])
-
-        for i in range(max_num_col_hints):
-            for j in range(max_num_row_hints + 2):
-                print("  ", end="")
-            for j in range(self.size[1]):
-                if len(self.cols_hints[j]) > i:
-                    if self.cols_hints[j][i] < 10:
-                        print(self.cols_hints[j][i], end=" ")
-                    else:
-                        print(self.cols_hints[j][i], end="")
-                else:
-                    print("  ", end="")
-            print()
-        for j in range(max_num_row_hints):
-            print("  ", end="")
-        print("    ", end="")
-        for i in range(self.size[1]):
-            print("__",end="")
-        print("\n")
-
-        for j in range(self.size[0]):
-            for i in range(max_num_row_hints):
-                if len(self.rows_hints[j]) > i:
-                    if self.rows_hints[j][i] < 10:
-                        print(self.rows_hints[j][i], end=" ")
-                    else:
-                        print(self.rows_hints[j][i], end="")
-                else:
-                    print("  ", end="")
-            print(" |  ", end="")
-            for i in range(self.size[1]):
-                if self.board[j][i] == None:
-                    print("  ", end="")
-                elif self.board[j][i]:
-                    print("# ", end="")
-                else:
-                    print(". ", end="")
-            print()
-        print("\n")
+    ### print current state of board, written in one call. fmt is one of BOARD_FORMATS
+    def print_board(self, fmt="ascii", out_file=None):
+        if out_file is None:
+            out_file = sys.stdout
+        out_file.write(render_board(self.board.to_lists(), self.rows_hints, self.cols_hints, fmt))
 
     ### run all functions on current line to eliminate and paint squares
     def update_line(self):
-        # update current line_length and line_hints
+        # update current line, line_length and line_hints
         if self.is_row:
             self.line_hints = self.rows_hints[self.line_idx]
             self.line_length = self.size[1] 
         else:
             self.line_hints = self.cols_hints[self.line_idx]
             self.line_length = self.size[0] 
+        self.line = self.board.line(self.is_row, self.line_idx)
+        self.changed_squares = []
+        line_key = (self.is_row, self.line_idx)
+        painted, unpainted = self.board.masks(self.is_row, self.line_idx)
+
+        # a line that is back to the squares it had after its last update (e.g. after search
+        # backtracks) has nothing new to find
+        if self.updated_masks.get(line_key) == (painted, unpainted):
+            if self.stats is not None:
+                self.stats.count("unchanged_lines")
+            return
+
+        # a line with the same hints and known squares as an earlier line is solved the same way
+        if self.cache is not None:
+            cache_key = (tuple(self.line_hints), self.line_length, painted, unpainted)
+            solved_masks = self.cache.get(cache_key)
+            if solved_masks is not None:
+                if self.stats is not None:
+                    self.stats.count("cache_hits")
+                self.set_squares(solved_masks[0] & ~painted, True)
+                self.set_squares(solved_masks[1] & ~unpainted, False)
+                self.updated_masks[line_key] = solved_masks
+                return
+
+        # run all functions on current line. lines with only a 0 hint are
+        # left to the generic functions, as the others assume a painted hint.
+        # when searching, lines may hold contradictions that only the generic functions handle
+        if not self.adaptive:
+            if max(self.line_hints) > 0 and not self.exact_only:
+                self.line_kernel()
+            self.generic_line = None
+            self.apply(self.eliminate_generic)
+            self.apply(self.paint_generic)
+        else:
+            self.update_line_adaptive()
+        #self.print_board()
+
+        if not self.contradiction:
+            self.updated_masks[line_key] = self.board.masks(self.is_row, self.line_idx)
+            if self.cache is not None:
+                self.cache.put(cache_key, self.updated_masks[line_key])
+
+    ### update_line rules, chosen by cost and yield:
+    ### - a line with every square known only has its runs checked against its hints, as the
+    ###   generic functions could only find a contradiction there
+    ### - line_kernel is skipped for a pass when, in the previous pass, it set fewer squares per
+    ###   unit of cost than the generic functions, and tried again after KERNEL_RETRY_PASSES.
+    ###   cost is counted in squares scanned, GENERIC_COST per square for the generic functions,
+    ###   rather than timed, so the same puzzle always takes the same choices
+    def update_line_adaptive(self):
+        run_kernel = max(self.line_hints) > 0 and not self.exact_only and None in self.line
+        if run_kernel and not self.kernel_enabled:
+            run_kernel = False
+            self.choose("kernel_skipped")
+        if run_kernel:
+            moves = self.moves
+            self.line_kernel()
+            self.kernel_squares += self.moves - moves
+            self.kernel_cost += self.line_length
+
+        if None not in self.line:
+            self.choose("generic_skipped")
+            if line_runs(self.line) != [hint for hint in self.line_hints if hint > 0]:
+                self.contradiction = True
+            return
+
+        moves = self.moves
+        self.generic_line = None
+        self.apply(self.eliminate_generic)
+        self.apply(self.paint_generic)
+        self.generic_squares += self.moves - moves
+        self.generic_cost += GENERIC_COST * self.line_length
 
-        # run all functions on current line
+    ### pick the rules for a new pass from the cost and yield of line_kernel in the last one
+    def start_pass(self):
+        if self.kernel_enabled:
+            # squares per unit of cost, compared without division
+            self.kernel_enabled = self.kernel_squares * self.generic_cost >= self.generic_squares * self.kernel_cost
+            if not self.kernel_enabled:
+                self.choose("kernel_off_passes")
+                self.kernel_off_passes = 1
+        elif self.kernel_off_passes >= KERNEL_RETRY_PASSES:
+            self.kernel_enabled = True
+        else:
+            self.choose("kernel_off_passes")
+            self.kernel_off_passes += 1
+        self.kernel_squares = 0
+        self.kernel_cost = 0
+        self.generic_squares = 0
+        self.generic_cost = 0
+
+    ### count an adaptive choice in self.choices, and in self.stats if enabled
+    def choose(self, choice):
+        self.choices[choice] += 1
+        if self.stats is not None:
+            self.stats.count(choice)
+
+    ### run the cheap rules on the current line against one view of its sequences,
+    ### which is only rebuilt after a rule sets squares
+    def line_kernel(self):
+        self.sequences_moves = -1
+        self.edges_moves = -1
         self.update_sequences()
         self.update_edges()
-        self.squeeze_paint()
+        self.apply(self.squeeze_paint)
 
         self.update_sequences()
-        self.eliminate_edges()
+        self.apply(self.eliminate_edges)
 
         self.update_sequences()
         self.update_edges()
         if self.min_hints_idx < len(self.line_hints) and self.max_hints_idx > 0:
-            self.pull_edges_push_paint()
+            self.apply(self.pull_edges_push_paint)
 
         self.update_sequences()
-        self.clear_completed()
+        self.apply(self.clear_completed)
 
         self.update_sequences()
-        self.interrupt_completed_hints()
-        
-        self.eliminate_generic()
-        self.paint_generic()
-        #self.print_board()
+        self.apply(self.interrupt_completed_hints)
+
+    ### call technique on the current line, recording its time and the squares it set
+    ### in self.stats if enabled
+    def apply(self, technique):
+        if self.stats is None:
+            technique()
+            return
+        moves = self.moves
+        start_time = time.perf_counter()
+        technique()
+        self.stats.record(technique.__name__, time.perf_counter() - start_time, self.moves - moves)
+
+    ### set every square of the current line whose bit is set in mask to value
+    def set_squares(self, mask, value):
+        while mask:
+            low_bit = mask & -mask
+            self.set_square(low_bit.bit_length() - 1, value)
+            mask ^= low_bit
+
+    ### number of squares in a line not accounted for by its hints and the gaps between them.
+    ### lines with less slack are more constrained and are updated first
+    def line_slack(self, is_row, line_idx):
+        if is_row:
+            line_hints = self.rows_hints[line_idx]
+            line_length = self.size[1]
+        else:
+            line_hints = self.cols_hints[line_idx]
+            line_length = self.size[0]
+        return line_length - sum(line_hints) - (len(line_hints) - 1)
+
+    ### add line to the work queue unless it is already waiting there. pass_num is the pass
+    ### the line is updated in: lines queued by changes made in pass n are updated in pass n + 1.
+    ### the queue is ordered by pass, then slack, so each pass is done before the next starts and
+    ### a line collects the changes of every crossing line of a pass before it is updated again
+    def queue_line(self, is_row, line_idx, pass_num):
+        if (is_row, line_idx) not in self.queued_lines:
+            self.queued_lines[(is_row, line_idx)] = pass_num
+            heapq.heappush(self.line_queue, ((pass_num, self.line_slack(is_row, line_idx)), is_row, line_idx))
+
+    ### call update_line on lines from the work queue until it is empty, i.e. no line can be
+    ### updated any further. a line is queued again whenever a square crossing it changes.
+    ### returns False if a contradiction was found or the solver was stopped (see should_stop),
+    ### leaving the queue empty
+    def propagate(self):
+        while self.line_queue:
+            if self.checkpoint_path is not None:
+                self.checkpoint_if_due()
+            (pass_num, slack), self.is_row, self.line_idx = heapq.heappop(self.line_queue)
+            del self.queued_lines[(self.is_row, self.line_idx)]
+            if self.should_stop(pass_num):
+                self.line_queue = []
+                self.queued_lines = {}
+                return False
+            if pass_num > self.passes:
+                self.passes = pass_num
+                if self.adaptive:
+                    self.start_pass()
+            self.update_line()
+            self.num_line_updates += 1
+            if self.stats is not None:
+                self.stats.record_pass(pass_num, len(self.changed_squares))
+            if self.contradiction:
+                self.line_queue = []
+                self.queued_lines = {}
+                return False
+
+            # queue crossing lines of changed squares. the current line itself is already
+            # fully solved by eliminate_generic and paint_generic, so it isn't queued again
+            for i in self.changed_squares:
+                self.queue_line(not self.is_row, i, pass_num + 1)
+        return True
+
+    ### True if solving should stop before a line update of pass pass_num: the cancel event is set,
+    ### the deadline has passed or pass_num is past max_passes, i.e. every line update of the
+    ### allowed passes is done. sets self.stop_reason
+    def should_stop(self, pass_num):
+        if self.cancel is not None and self.cancel.is_set():
+            self.stop_reason = "cancelled"
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stop_reason = "deadline"
+        elif self.max_passes is not None and pass_num > self.max_passes:
+            self.stop_reason = "max_passes"
+        return self.stop_reason is not None
+
+    ### set a square outside of update_line, e.g. as a search hypothesis, and queue its lines
+    def assume_square(self, row, col, value):
+        self.board.set(row, col, value)
+        if self.trail is not None:
+            self.trail.append((row, col))
+        self.queue_line(True, row, self.passes + 1)
+        self.queue_line(False, col, self.passes + 1)
+
+    ### unset every square set since the trail had length mark
+    def undo(self, mark):
+        while len(self.trail) > mark:
+            row, col = self.trail.pop()
+            self.board.set(row, col, None)
+        self.contradiction = False
+
+    ### contradiction probing: assume each unknown square painted, then unpainted, and propagate.
+    ### if one assumption leads to a contradiction, the square must take the other value.
+    ### repeats until no square can be determined. returns False if the puzzle has no solution
+    ### (or if the solver was stopped)
+    def probe(self):
+        progress = True
+        while progress and not self.is_complete():
+            progress = False
+            for row in range(self.size[0]):
+                for col in range(self.size[1]):
+                    if self.board.get(row, col) != None:
+                        continue
+                    for value in (True, False):
+                        if self.stats is not None:
+                            self.stats.count("probes")
+                        mark = len(self.trail)
+                        self.probe_mark = mark
+                        self.assume_square(row, col, value)
+                        is_consistent = self.propagate()
+                        self.undo(mark)
+                        self.probe_mark = None
+                        if self.stop_reason is not None:
+                            return False
+                        if not is_consistent:
+                            self.assume_square(row, col, not value)
+                            if not self.propagate():
+                                return False
+                            progress = True
+                            break
+        return True
+
+    ### depth first search over unknown squares, trying painted before unpainted and undoing
+    ### squares set by a failed branch with the trail rather than copying the board.
+    ### the stack holds (row, col, trail mark, value tried) for each open branch.
+    ### returns True once a solution is found, or False if there is none (left).
+    ### resume=True continues the previous search past the solution it found last.
+    ### if the solver is stopped, every hypothesis is undone and False is returned
+    def search(self, resume=False):
+        if not resume:
+            self.search_stack = []
+        return self.continue_search(resume)
+
+    ### the search loop of search, starting with a backtrack if backtrack is True
+    def continue_search(self, backtrack=False):
+        while True:
+            if self.stop_reason is not None:
+                if self.search_stack:
+                    self.undo(self.search_stack[0][2])
+                    self.search_stack = []
+                return False
+            if not backtrack and not self.contradiction:
+                square = self.first_unknown()
+                if square is None:
+                    return True
+                row, col = square
+                if self.stats is not None:
+                    self.stats.count("branches")
+                self.search_stack.append((row, col, len(self.trail), True))
+                self.assume_square(row, col, True)
+                self.propagate()
+                continue
+
+            # backtrack to the most recent branch that hasn't tried unpainted yet
+            backtrack = False
+            while self.search_stack:
+                row, col, mark, value = self.search_stack.pop()
+                self.undo(mark)
+                if value:
+                    self.search_stack.append((row, col, mark, False))
+                    self.assume_square(row, col, False)
+                    self.propagate()
+                    break
+            else:
+                return False
+
+    ### (row, col) of the first unknown square, or None if the board is complete
+    def first_unknown(self):
+        for row in range(self.size[0]):
+            line = self.board.line(True, row)
+            if None in line:
+                return row, line.index(None)
+        return None
+
+    ### run nonogram solver. line logic (update_line on lines from a work queue) runs until
+    ### no line changes. if the board is still incomplete and search is True, contradiction
+    ### probing and then depth first search finish it. self.phase is set to the phase that
+    ### finished the puzzle: "lines", "probing" or "search", or "unsolvable" or "incomplete".
+    ### solving stops early, with phase "incomplete", once time_limit seconds have passed, a line
+    ### update would start pass max_passes + 1, or cancel (e.g. a threading.Event set from another
+    ### thread) is set. self.stop_reason is then "deadline", "max_passes" or "cancelled" (None if
+    ### solving wasn't stopped), and the board holds only squares determined so far, see completion.
+    ### returns the board as a list of rows of None (unknown), True (painted) and False (unpainted)
+    def run_solver(self, search=True, time_limit=None, max_passes=None, cancel=None):
+        self.start_solving(time_limit, max_passes, cancel)
+        for i in range(self.size[1]):
+            self.queue_line(False, i, 1)
+        for i in range(self.size[0]):
+            self.queue_line(True, i, 1)
+        return self.finish_solving(search)
+
+    ### reset the work queue and counters and set the limits of a run (see run_solver)
+    def start_solving(self, time_limit, max_passes, cancel):
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.max_passes = max_passes
+        self.cancel = cancel
+        self.stop_reason = None
+        self.line_queue = []
+        self.queued_lines = {} # (is_row, line_idx) -> pass number
+        self.num_line_updates = 0
+        self.passes = 0
+        self.contradiction = False
+
+    ### propagate the queued lines, then probe and search if needed, setting self.phase
+    def finish_solving(self, search):
+        self.stage = "lines"
+        if not self.propagate():
+            self.phase = "unsolvable"
+        elif self.is_complete():
+            self.phase = "lines"
+        elif not search:
+            self.phase = "incomplete"
+        else:
+            # hypotheses may be inconsistent, so only the exact line solver is used from here on
+            self.exact_only = True
+            self.trail = []
+            self.stage = "probing"
+            if not self.probe():
+                self.phase = "unsolvable"
+            elif self.is_complete():
+                self.phase = "probing"
+            else:
+                self.stage = "search"
+                self.phase = "search" if self.search() else "unsolvable"
+            self.finish_search()
+        return self.finish_run()
+
+    ### leave probing and search, keeping the squares they set
+    def finish_search(self):
+        self.trail = None
+        self.exact_only = False
+        self.provenance_complete = False
+
+    ### the result of run_solver, once the stage in progress has ended
+    def finish_run(self):
+        self.stage = None
+        if self.stop_reason is not None:
+            self.phase = "incomplete"
+        return self.board.to_lists()
+
+    ### change the hints of some lines and solve again. rows_hints and cols_hints map line indices
+    ### to their new hints. if the board was solved by line logic alone, the line updates that
+    ### may depend on a changed line are replayed in the order they ran, and only the squares
+    ### they no longer deduce are cleared. the changed lines and the lines crossing cleared squares
+    ### are then updated again. after probing or search, whose hypotheses aren't tracked, a
+    ### stopped solve, or without track_provenance, the board is rebuilt from scratch, recording
+    ### provenance for the next edit. other arguments and the result are as for run_solver
+    def update_hints(self, rows_hints=None, cols_hints=None, search=True, time_limit=None, max_passes=None,
+                     cancel=None):
+        new_rows_hints = list(self.rows_hints)
+        new_cols_hints = list(self.cols_hints)
+        for line_idx, line_hints in (rows_hints or {}).items():
+            new_rows_hints[line_idx] = line_hints
+        for line_idx, line_hints in (cols_hints or {}).items():
+            new_cols_hints[line_idx] = line_hints
+        validate_hints(new_rows_hints, new_cols_hints)
+        changed_lines = set()
+        for i in range(self.size[0]):
+            if new_rows_hints[i] != self.rows_hints[i]:
+                changed_lines.add((True, i))
+        for i in range(self.size[1]):
+            if new_cols_hints[i] != self.cols_hints[i]:
+                changed_lines.add((False, i))
+        for line_key in changed_lines:
+            self.updated_masks.pop(line_key, None) # updated with the old hints
+        self.rows_hints = new_rows_hints
+        self.cols_hints = new_cols_hints
+
+        if (self.phase not in ("lines", "incomplete") or self.stop_reason is not None or not self.provenance_complete
+                or self.provenance is None):
+            # later edits can be replayed from the provenance recorded from here on
+            self.board = type(self.board)(self.size[0], self.size[1])
+            self.provenance = [[None for x in range(self.size[1])] for y in range(self.size[0])]
+            self.provenance_complete = True
+            return self.run_solver(search, time_limit, max_passes, cancel)
+
+        # squares in the order they were set. consecutive squares set by the same line were set
+        # by one line update, as a line is only queued again after a crossing line changes it
+        set_squares = []
+        for row in range(self.size[0]):
+            for col in range(self.size[1]):
+                if self.provenance[row][col] is not None:
+                    set_squares.append(self.provenance[row][col] + (row, col))
+        set_squares.sort()
+        line_updates = []
+        for set_time, is_row, line_idx, row, col in set_squares:
+            if not line_updates or line_updates[-1][1] != (is_row, line_idx):
+                line_updates.append((set_time, (is_row, line_idx), []))
+            line_updates[-1][2].append((row, col))
+
+        # replay the line updates that may have changed: those of changed lines, and those of
+        # lines holding a cleared square set before the update. each is solved again from the
+        # squares of its line kept from before it, and squares no longer deduced are cleared.
+        # tainted maps a line to the time its first cleared square was set
+        tainted = {}
+        cleared = set()
+        for start_time, (is_row, line_idx), squares in line_updates:
+            if (is_row, line_idx) not in changed_lines and tainted.get((is_row, line_idx), start_time) >= start_time:
+                continue
+            line_hints = self.rows_hints[line_idx] if is_row else self.cols_hints[line_idx]
+            line = list(self.board.line(is_row, line_idx)) # list_board returns its own row or col
+            for i in range(len(line)):
+                row, col = (line_idx, i) if is_row else (i, line_idx)
+                if line[i] != None and ((row, col) in cleared or self.provenance[row][col][0] >= start_time):
+                    line[i] = None
+            solved_line = solve_line(line_hints, line)
+            for row, col in squares:
+                if solved_line is None or solved_line[col if is_row else row] != self.board.get(row, col):
+                    cleared.add((row, col))
+                    tainted.setdefault((True, row), self.provenance[row][col][0])
+                    tainted.setdefault((False, col), self.provenance[row][col][0])
 
-    ### run nonogram solver by repeatedly calling update_line on all rows and cols until board is complete
-    def run_solver(self):
-        incomplete = True
-        while incomplete:
-            # cols
-            self.is_row = False
+        self.start_solving(time_limit, max_passes, cancel)
+        for row, col in cleared:
+            self.board.set(row, col, None)
+            self.provenance[row][col] = None
+            self.queue_line(True, row, 1)
+            self.queue_line(False, col, 1)
+        for is_row, line_idx in changed_lines:
+            self.queue_line(is_row, line_idx, 1)
+        return self.finish_solving(search)
+
+    ### write checkpoints of the solve to path (see checkpoint) every interval seconds if given,
+    ### and on signal signum if given (e.g. signal.SIGUSR1), at the next line update
+    def enable_checkpoints(self, path, interval=None, signum=None):
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval
+        self.next_checkpoint = None if interval is None else time.perf_counter() + interval
+        if signum is not None:
+            signal.signal(signum, self.request_checkpoint)
+
+    ### write a checkpoint at the next line update. usable as a signal handler
+    def request_checkpoint(self, signum=None, frame=None):
+        self.checkpoint_due = True
+
+    def checkpoint_if_due(self):
+        if self.checkpoint_due or (self.next_checkpoint is not None and time.perf_counter() >= self.next_checkpoint):
+            self.save_checkpoint(self.checkpoint_path)
+            self.checkpoint_due = False
+            if self.checkpoint_interval is not None:
+                self.next_checkpoint = time.perf_counter() + self.checkpoint_interval
+
+    ### the state of the solve between two line updates as a JSON-serializable dict: hints, the
+    ### board as a string of CHECKPOINT_SQUARES by row, the stage and pass, the work queue as
+    ### [is_row, line_idx, pass_num] and, when searching, the trail as square numbers
+    ### (row * num_cols + col) and the search stack as [square number, trail mark, value tried],
+    ### plus self.checkpoint_info.
+    ### a probe in progress isn't saved: its squares are left out and probing starts over
+    def checkpoint(self):
+        num_cols = self.size[1]
+        board = self.board.to_lists()
+        if self.stage == "probing" and self.probe_mark is not None:
+            for row, col in self.trail[self.probe_mark:]:
+                board[row][col] = None
+        state = {"rows": self.rows_hints, "cols": self.cols_hints,
+                 "board": "".join(CHECKPOINT_SQUARES[square] for row in board for square in row),
+                 "stage": self.stage, "passes": self.passes}
+        state.update(self.checkpoint_info)
+        if self.stage != "probing":
+            state["queue"] = [[int(is_row), line_idx, pass_num]
+                              for (is_row, line_idx), pass_num in self.queued_lines.items()]
+        if self.stage == "search":
+            state["trail"] = [row * num_cols + col for row, col in self.trail]
+            state["search_stack"] = [[row * num_cols + col, mark, int(value)]
+                                     for row, col, mark, value in self.search_stack]
+        return state
+
+    ### write checkpoint() to path (see write_checkpoint)
+    def save_checkpoint(self, path):
+        write_checkpoint(path, self.checkpoint())
+
+    ### continue a solve restored by load_checkpoint from where its checkpoint was taken.
+    ### arguments and the result are as for run_solver
+    def resume_solver(self, search=True, time_limit=None, max_passes=None, cancel=None):
+        state = self.restored_state
+        self.start_solving(time_limit, max_passes, cancel)
+        self.passes = state["passes"]
+        if state["stage"] == "probing":
             for i in range(self.size[1]):
-                self.line_idx = i
-                self.update_line()
-            # rows
-            self.is_row = True
-            for i in range(self.size[0]): 
-                self.line_idx = i
-                self.update_line()
-            # check if board is complete
-            incomplete = False
-            for i in range(len(self.board)):
-                for j in range(len(self.board[0])):
-                    if self.board[i][j] == None:
-                        incomplete = True
-        self.print_board() # print completed board
+                self.queue_line(False, i, self.passes + 1)
+            for i in range(self.size[0]):
+                self.queue_line(True, i, self.passes + 1)
+            board = self.finish_solving(search)
+            if self.phase == "lines": # completed by the squares probing had set
+                self.phase = "probing"
+            return board
+        for is_row, line_idx, pass_num in state.get("queue", []):
+            self.queue_line(bool(is_row), line_idx, pass_num)
+        if state["stage"] != "search":
+            return self.finish_solving(search)
 
-### take row and col hints from user and convert to lists
-def user_input():
-    rows = input("Enter row values, rows separated by commas:\n")
-    cols = input("Enter col values, cols separated by commas:\n")
-    print()
+        num_cols = self.size[1]
+        self.exact_only = True
+        self.trail = [divmod(square, num_cols) for square in state["trail"]]
+        self.search_stack = [divmod(square, num_cols) + (mark, bool(value))
+                             for square, mark, value in state["search_stack"]]
+        self.stage = "search"
+        self.propagate()
+        self.phase = "search" if self.continue_search() else "unsolvable"
+        self.finish_search()
+        return self.finish_run()
 
-    # parse row values/hints
-    rows_hints = [[]]
-    cur_num = ""
-    hints_iter = 0
-    i = 0
-    for char in rows:
-        if char == " ":
-            rows_hints[hints_iter].append(int(cur_num))
-            cur_num = ""
-        elif char == ",":
-            rows_hints[hints_iter].append(int(cur_num))
-            rows_hints.append([])
-            cur_num = ""
-            hints_iter += 1
+    ### percentage of squares determined so far
+    def completion(self):
+        num_squares = self.size[0] * self.size[1]
+        return 100.0 * (num_squares - self.board.count_unknown()) / num_squares
+
+    ### find up to limit solutions, e.g. limit=2 to check a puzzle has exactly one. line logic and
+    ### probing run once, as in run_solver, then the depth first search is resumed after each
+    ### solution, so branches keep reusing the propagated board. returns the solutions found,
+    ### each a list of rows of True and False. self.phase is set as in run_solver
+    def count_solutions(self, limit=2):
+        board = self.run_solver(search=False)
+        if self.phase == "unsolvable":
+            return []
+        if self.phase == "lines":
+            return [board]
+
+        solutions = []
+        self.exact_only = True
+        self.trail = []
+        self.stage = "probing"
+        if not self.probe():
+            self.phase = "unsolvable"
+        elif self.is_complete():
+            self.phase = "probing"
+            solutions.append(self.board.to_lists())
         else:
-            cur_num += char
-            if i == len(rows) - 1:
-                rows_hints[hints_iter].append(int(cur_num))
-        i += 1
+            self.stage = "search"
+            found = self.search()
+            while found:
+                solutions.append(self.board.to_lists())
+                if len(solutions) >= limit:
+                    break
+                found = self.search(resume=True)
+            self.phase = "search" if solutions else "unsolvable"
+        self.finish_search()
+        self.stage = None
+        return solutions
+
+    ### True if every square of the board is known
+    def is_complete(self):
+        return self.board.count_unknown() == 0
+
+### board backend storing squares row by row as lists of None (unknown), True (painted) and
+### False (unpainted), and the (painted, unpainted) bitmasks of every row and col, kept up to date
+### by set. masks is O(1), so comparing masks tells whether a line changed
+class list_board:
+    def __init__(self, num_rows, num_cols):
+        self.size = (num_rows, num_cols)
+        self.rows = [[None for x in range(num_cols)] for y in range(num_rows)]
+        self.rows_painted = [0] * num_rows
+        self.rows_unpainted = [0] * num_rows
+        self.cols_painted = [0] * num_cols
+        self.cols_unpainted = [0] * num_cols
+
+    def get(self, row, col):
+        return self.rows[row][col]
+
+    def set(self, row, col, value):
+        old_value = self.rows[row][col]
+        if old_value is value:
+            return
+        self.rows[row][col] = value
+        row_bit = 1 << col
+        col_bit = 1 << row
+        if old_value:
+            self.rows_painted[row] ^= row_bit
+            self.cols_painted[col] ^= col_bit
+        elif old_value == False:
+            self.rows_unpainted[row] ^= row_bit
+            self.cols_unpainted[col] ^= col_bit
+        if value:
+            self.rows_painted[row] |= row_bit
+            self.cols_painted[col] |= col_bit
+        elif value == False:
+            self.rows_unpainted[row] |= row_bit
+            self.cols_unpainted[col] |= col_bit
+
+    ### current line, to be read but not written to directly. rows are the board's own lists,
+    ### cols are copied
+    def line(self, is_row, line_idx):
+        if is_row:
+            return self.rows[line_idx]
+        return [row[line_idx] for row in self.rows]
+
+    ### (painted, unpainted) bitmasks of a line, bit i set if square i is known
+    def masks(self, is_row, line_idx):
+        if is_row:
+            return self.rows_painted[line_idx], self.rows_unpainted[line_idx]
+        return self.cols_painted[line_idx], self.cols_unpainted[line_idx]
+
+    def count_unknown(self):
+        return sum(row.count(None) for row in self.rows)
+
+    def to_lists(self):
+        return [list(row) for row in self.rows]
+
+### bounded LRU cache of solved lines, keyed by (hints, line length, painted mask, unpainted mask)
+### and holding the (painted, unpainted) masks of the line after update_line.
+### one cache can be passed to any number of nonogram_solver instances
+class line_cache:
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    ### solved masks for key, or None if key isn't cached
+    def get(self, key):
+        solved_masks = self.entries.get(key)
+        if solved_masks is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return solved_masks
+
+    ### store solved masks for key, evicting the least recently used entry when full
+    def put(self, key, solved_masks):
+        self.entries[key] = solved_masks
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"size": len(self.entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+### per-technique and per-pass solver statistics, enabled by passing a solver_stats to nonogram_solver.
+### records calls, time spent and squares newly set for each technique used by update_line,
+### line updates and squares set in each pass, and counters such as cache hits and search branches
+class solver_stats:
+    def __init__(self):
+        self.techniques = {}
+        self.passes = {}
+        self.counters = {}
+
+    def record(self, technique_name, elapsed, num_squares):
+        technique = self.techniques.get(technique_name)
+        if technique is None:
+            technique = self.techniques[technique_name] = {"calls": 0, "time": 0.0, "squares": 0}
+        technique["calls"] += 1
+        technique["time"] += elapsed
+        technique["squares"] += num_squares
+
+    def record_pass(self, pass_num, num_squares):
+        pass_stats = self.passes.get(pass_num)
+        if pass_stats is None:
+            pass_stats = self.passes[pass_num] = {"line_updates": 0, "squares": 0}
+        pass_stats["line_updates"] += 1
+        pass_stats["squares"] += num_squares
+
+    def count(self, counter_name):
+        self.counters[counter_name] = self.counters.get(counter_name, 0) + 1
+
+    def to_dict(self):
+        return {"techniques": {name: dict(technique) for name, technique in self.techniques.items()},
+                "passes": {pass_num: dict(pass_stats) for pass_num, pass_stats in sorted(self.passes.items())},
+                "counters": dict(self.counters)}
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+### lengths of the runs of painted squares in a fully known line
+def line_runs(line):
+    runs = []
+    run_length = 0
+    for square in line:
+        if square:
+            run_length += 1
+        elif run_length:
+            runs.append(run_length)
+            run_length = 0
+    if run_length:
+        runs.append(run_length)
+    return runs
+
+### exact line solver. returns the line with every square that is the same in all
+### valid arrangements of line_hints filled in, or None if no arrangement fits.
+### dynamic programming over (position, hint index) in O(line length * number of hints)
+def solve_line(line_hints, line):
+    hints = [hint for hint in line_hints if hint > 0] # a hint of 0 marks an empty line
+    length = len(line)
+    num_hints = len(hints)
+
+    # num_unpainted[i] = number of known unpainted squares before square i,
+    # so a hint fits in squares [s, e) if num_unpainted[s] == num_unpainted[e]
+    num_unpainted = [0] * (length + 1)
+    for i in range(length):
+        num_unpainted[i + 1] = num_unpainted[i] + (line[i] == False)
 
-    # parse col values/hints
-    cols_hints = [[]]
+    # prefix[i][j]: first i squares can hold exactly the first j hints
+    prefix = [[False] * (num_hints + 1) for i in range(length + 1)]
+    prefix[0][0] = True
+    for i in range(1, length + 1):
+        for j in range(num_hints + 1):
+            if line[i - 1] != True and prefix[i - 1][j]: # square i-1 unpainted
+                prefix[i][j] = True
+            elif j > 0: # hint j-1 ends at square i-1
+                start = i - hints[j - 1]
+                if start >= 0 and num_unpainted[start] == num_unpainted[i]:
+                    if start == 0:
+                        prefix[i][j] = prefix[0][j - 1]
+                    else:
+                        prefix[i][j] = line[start - 1] != True and prefix[start - 1][j - 1]
+    if not prefix[length][num_hints]:
+        return None
+
+    # suffix[i][j]: squares from i onward can hold exactly hints j onward
+    suffix = [[False] * (num_hints + 1) for i in range(length + 1)]
+    suffix[length][num_hints] = True
+    for i in range(length - 1, -1, -1):
+        for j in range(num_hints + 1):
+            if line[i] != True and suffix[i + 1][j]: # square i unpainted
+                suffix[i][j] = True
+            elif j < num_hints: # hint j starts at square i
+                end = i + hints[j]
+                if end <= length and num_unpainted[i] == num_unpainted[end]:
+                    if end == length:
+                        suffix[i][j] = suffix[length][j + 1]
+                    else:
+                        suffix[i][j] = line[end] != True and suffix[end + 1][j + 1]
+
+    # squares that may be painted: covered by some valid placement of a hint.
+    # placements are marked in a difference array to stay linear in line length
+    num_placements = [0] * (length + 1)
+    for j in range(num_hints):
+        hint = hints[j]
+        for start in range(length - hint + 1):
+            end = start + hint
+            if num_unpainted[start] != num_unpainted[end]:
+                continue
+            if start == 0:
+                fits_before = prefix[0][j]
+            else:
+                fits_before = line[start - 1] != True and prefix[start - 1][j]
+            if not fits_before:
+                continue
+            if end == length:
+                fits_after = suffix[length][j + 1]
+            else:
+                fits_after = line[end] != True and suffix[end + 1][j + 1]
+            if fits_after:
+                num_placements[start] += 1
+                num_placements[end] -= 1
+
+    # squares that may be unpainted: lie between the same hint index from both sides
+    solved_line = list(line)
+    covered = 0
+    for i in range(length):
+        covered += num_placements[i]
+        if line[i] != None:
+            continue
+        can_paint = covered > 0
+        can_unpaint = False
+        for j in range(num_hints + 1):
+            if prefix[i][j] and suffix[i + 1][j]:
+                can_unpaint = True
+                break
+        if can_paint and not can_unpaint:
+            solved_line[i] = True
+        elif can_unpaint and not can_paint:
+            solved_line[i] = False
+    return solved_line
+
+### convert hints text to lists, e.g. "1 2,3" -> [[1, 2], [3]].
+### numbers on the same line are separated by a space, lines are separated by commas
+def parse_hints(text):
+    hints = [[]]
     cur_num = ""
     hints_iter = 0
     i = 0
-    for char in cols:
+    for char in text:
         if char == " ":
-            cols_hints[hints_iter].append(int(cur_num))
+            hints[hints_iter].append(int(cur_num))
             cur_num = ""
         elif char == ",":
-            cols_hints[hints_iter].append(int(cur_num))
-            cols_hints.append([])
+            hints[hints_iter].append(int(cur_num))
+            hints.append([])
             cur_num = ""
             hints_iter += 1
         else:
             cur_num += char
-            if i == len(cols) - 1:
-                cols_hints[hints_iter].append(int(cur_num))
+            if i == len(text) - 1:
+                hints[hints_iter].append(int(cur_num))
         i += 1
-    return rows_hints, cols_hints
-
-### repeatedly run nonogram solver, requesting user input for row and col hints 
-### (values/numbers from nonogram board)
-while True:
-    rows_hints, cols_hints = user_input()
-    ng_solver = nonogram_solver(rows_hints, cols_hints)
-    ng_solver.run_solver()
\ No newline at end of file
+    return hints
+
+### raised for hints that can't describe any board, before any solving is done
+class invalid_puzzle(ValueError):
+    pass
+
+### True for a list, tuple or other sequence that isn't a string
+def is_sequence(value):
+    return isinstance(value, collections.abc.Sequence) and not isinstance(value, (str, bytes))
+
+### check that rows_hints and cols_hints can describe a board, raising invalid_puzzle with the
+### first problem found: hints that aren't sequences of sequences (e.g. lists of lists), a line
+### without hints, a hint that isn't a non-negative integer, 0 next to other hints, hints (and the
+### gaps between them) longer than their line, or row and col hints painting a different number
+### of squares. one pass over the hints, so much cheaper than solving
+def validate_hints(rows_hints, cols_hints):
+    if not is_sequence(rows_hints) or not is_sequence(cols_hints):
+        raise invalid_puzzle("row and col hints must be sequences of lines")
+    if not rows_hints or not cols_hints:
+        raise invalid_puzzle("puzzle needs at least one row and one col")
+    totals = []
+    for lines_hints, line_type, line_length in ((rows_hints, "row", len(cols_hints)),
+                                                (cols_hints, "col", len(rows_hints))):
+        total = 0
+        for line_idx, line_hints in enumerate(lines_hints):
+            if not is_sequence(line_hints):
+                raise invalid_puzzle("%s %d hints must be a sequence, not %r" % (line_type, line_idx, line_hints))
+            if not line_hints:
+                raise invalid_puzzle("%s %d has no hints (0 for an empty line)" % (line_type, line_idx))
+            for hint in line_hints:
+                if type(hint) is not int or hint < 0:
+                    raise invalid_puzzle("%s %d has invalid hint %r" % (line_type, line_idx, hint))
+            if 0 in line_hints and len(line_hints) > 1:
+                raise invalid_puzzle("%s %d has 0 next to other hints" % (line_type, line_idx))
+            line_total = sum(line_hints)
+            min_length = line_total + len(line_hints) - 1
+            if min_length > line_length:
+                raise invalid_puzzle("%s %d needs %d squares but has %d"
+                                     % (line_type, line_idx, min_length, line_length))
+            total += line_total
+        totals.append(total)
+    if totals[0] != totals[1]:
+        raise invalid_puzzle("row hints paint %d squares but col hints paint %d" % tuple(totals))
+
+### take row and col hints from user and convert to lists
+def user_input():
+    rows = input("Enter row values, rows separated by commas:\n")
+    cols = input("Enter col values, cols separated by commas:\n")
+    print()
+    return parse_hints(rows), parse_hints(cols)
+
+### board as strings, one per row: "#" painted, "." unpainted, "?" unknown
+def board_to_strings(board):
+    return ["".join("?" if square == None else "#" if square else "." for square in row) for row in board]
+
+BOARD_FORMATS = ("ascii", "text", "json", "pbm", "none")
+
+### render board (a list of rows of None, True and False) as a single string in format fmt:
+### "ascii" board with hints, as printed by the interactive solver
+### "text" one line per row of "#" (painted), "." (unpainted) and "?" (unknown)
+### "json" object with rows, cols and board (as in "text")
+### "pbm" plain portable bitmap, painted squares black and other squares white
+### "none" empty string, for batch and benchmark runs
+def render_board(board, rows_hints, cols_hints, fmt="ascii"):
+    if fmt == "ascii":
+        return render_ascii(board, rows_hints, cols_hints)
+    if fmt == "text":
+        return "\n".join(board_to_strings(board)) + "\n"
+    if fmt == "json":
+        return json.dumps({"rows": rows_hints, "cols": cols_hints, "board": board_to_strings(board)}) + "\n"
+    if fmt == "pbm":
+        num_cols = len(board[0]) if board else len(cols_hints)
+        pixels = "".join("1" if square else "0" for row in board for square in row)
+        # plain pbm lines should be at most 70 characters
+        lines = ["P1", "%d %d" % (num_cols, len(board))]
+        lines += [pixels[i:i + 70] for i in range(0, len(pixels), 70)]
+        return "\n".join(lines) + "\n"
+    if fmt == "none":
+        return ""
+    raise ValueError("unknown board format: %r" % (fmt,))
+
+### board with col hints above and row hints to the left. every hint slot and square is as wide
+### as the longest hint plus a space (at least 2 characters), so hints of 10 or more stay aligned.
+### a single row (col) hint of 10 or more widens every row hint slot (every square column)
+def render_ascii(board, rows_hints, cols_hints):
+    max_num_col_hints = max([len(hints) for hints in cols_hints] + [0])
+    max_num_row_hints = max([len(hints) for hints in rows_hints] + [0])
+    col_width = max([len(str(hint)) + 1 for hints in cols_hints for hint in hints] + [2])
+    row_width = max([len(str(hint)) + 1 for hints in rows_hints for hint in hints] + [2])
+    row_margin = " " * (max_num_row_hints * row_width)
+    squares = {None: " ", True: "#", False: "."}
+
+    text = []
+    for i in range(max_num_col_hints):
+        text.append(row_margin + "    ")
+        for hints in cols_hints:
+            text.append((str(hints[i]) if len(hints) > i else "").ljust(col_width))
+        text.append("\n")
+    text.append(row_margin + "    " + "_" * (col_width * len(cols_hints)) + "\n\n")
+
+    for row, hints in zip(board, rows_hints):
+        for i in range(max_num_row_hints):
+            text.append((str(hints[i]) if len(hints) > i else "").ljust(row_width))
+        text.append(" |  ")
+        for square in row:
+            text.append(squares[square].ljust(col_width))
+        text.append("\n")
+    text.append("\n\n")
+    return "".join(text)
+
+CHECKPOINT_SQUARES = {None: "?", True: "#", False: "."}
+
+### write a checkpoint state to path as compact JSON, replacing any earlier checkpoint at once.
+### besides the states of nonogram_solver.checkpoint, {"stage": "done"} marks a finished solve
+### (with "batch_index", the last puzzle of a batch whose result was written)
+def write_checkpoint(path, state):
+    with open(path + ".tmp", "w") as checkpoint_file:
+        json.dump(state, checkpoint_file, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+def read_checkpoint(path):
+    with open(path) as checkpoint_file:
+        return json.load(checkpoint_file)
+
+### nonogram_solver restored from a checkpoint state, to be continued with resume_solver.
+### solver_options are passed to nonogram_solver (e.g. cache, stats).
+### raises ValueError for the state of a finished solve, which has nothing left to resume
+def restore_checkpoint(state, **solver_options):
+    if state["stage"] == "done":
+        raise ValueError("checkpoint is of a finished solve")
+    ng_solver = nonogram_solver(state["rows"], state["cols"], **solver_options)
+    num_cols = ng_solver.size[1]
+    square_values = {char: value for value, char in CHECKPOINT_SQUARES.items()}
+    for i, char in enumerate(state["board"]):
+        if char != "?":
+            ng_solver.board.set(i // num_cols, i % num_cols, square_values[char])
+    ng_solver.provenance_complete = False
+    ng_solver.restored_state = state
+    return ng_solver
+
+### restore_checkpoint of the checkpoint written to path
+def load_checkpoint(path, **solver_options):
+    return restore_checkpoint(read_checkpoint(path), **solver_options)
+
+### lazily read puzzles from a file, yielding (puzzle_id, rows_hints, cols_hints) or
+### (puzzle_id, None, error message) for puzzles that can't be read. each puzzle is either
+### one JSON object per line, {"id": ..., "rows": [[...], ...], "cols": [[...], ...]},
+### or a line of row hints followed by a line of col hints in the user_input format
+def read_puzzles(puzzle_file):
+    puzzle_num = 0
+    rows_text = None
+    for text in puzzle_file:
+        text = text.strip()
+        if not text:
+            continue
+        puzzle_id = puzzle_num
+        try:
+            if text.startswith("{"):
+                puzzle = json.loads(text)
+                puzzle_id = puzzle.get("id", puzzle_num)
+                rows_hints, cols_hints = puzzle["rows"], puzzle["cols"]
+            elif rows_text is None:
+                rows_text = text
+                continue
+            else:
+                hints_text, rows_text = rows_text, None
+                rows_hints, cols_hints = parse_hints(hints_text), parse_hints(text)
+        except (ValueError, KeyError) as error:
+            rows_hints, cols_hints = None, "invalid puzzle: " + repr(error)
+        puzzle_num += 1
+        yield puzzle_id, rows_hints, cols_hints
+    if rows_text is not None:
+        yield puzzle_num, None, "invalid puzzle: row hints without col hints"
+
+### solve every puzzle read from puzzle_file, writing one JSON result per line to out_file
+### as soon as each puzzle finishes. one line_cache of bounded size is shared by all puzzles,
+### as is stats if given. solver_type is nonogram_solver or another engine with the same interface.
+### fmt "json" writes one JSON result per puzzle, any other of BOARD_FORMATS renders each solved board.
+### max_solutions counts solutions of each puzzle up to that many instead (see count_solutions), with
+### status "unique", "multiple" or "unsolvable" and every solution found in the JSON result.
+### time_limit and max_passes bound each solve (see run_solver): stopped puzzles get status
+### "incomplete" with the stop reason and the percentage of squares determined.
+### checkpoint_path enables checkpoints of the puzzle being solved (see enable_checkpoints) every
+### checkpoint_interval seconds and on SIGUSR1, with its position in the batch as "batch_index".
+### once a puzzle's result is written, the checkpoint becomes a "done" state with its batch_index.
+### resume_state is such a checkpoint from read_checkpoint: the puzzles before it are skipped, a
+### puzzle in progress is finished with resume_solver, and the batch goes on from the next puzzle
+def solve_batch(puzzle_file, out_file, cache_size=100000, stats=None, solver_type=None, fmt="json",
+                max_solutions=None, time_limit=None, max_passes=None, checkpoint_path=None, checkpoint_interval=None,
+                resume_state=None):
+    if solver_type is None:
+        solver_type = nonogram_solver
+    cache = line_cache(cache_size)
+    resumed = None
+    resume_index = None
+    if resume_state is not None and resume_state["stage"] == "done":
+        resume_index = resume_state["batch_index"] + 1
+    elif resume_state is not None:
+        resumed = restore_checkpoint(resume_state, cache=cache, stats=stats)
+        resume_index = resume_state["batch_index"]
+
+    ng_solver = None
+    # one handler for the whole batch, asking whichever puzzle is being solved for a checkpoint
+    def request_checkpoint(signum, frame):
+        if ng_solver is not None:
+            ng_solver.request_checkpoint()
+    previous_handler = None
+    if checkpoint_path is not None and hasattr(signal, "SIGUSR1"):
+        previous_handler = signal.signal(signal.SIGUSR1, request_checkpoint)
+    try:
+        num_puzzles = 0
+        for index, (puzzle_id, rows_hints, cols_hints) in enumerate(read_puzzles(puzzle_file)):
+            num_puzzles = index + 1
+            if resume_index is not None and index < resume_index:
+                continue
+            ng_solver = None
+            if resumed is not None and index == resume_index:
+                if (rows_hints, cols_hints) != (resumed.rows_hints, resumed.cols_hints):
+                    raise ValueError("checkpoint is of a different puzzle than puzzle %d of the batch" % index)
+                ng_solver = resumed
+            elif rows_hints is None:
+                result = {"id": puzzle_id, "status": "error", "error": cols_hints}
+            else:
+                try:
+                    ng_solver = solver_type(rows_hints, cols_hints, cache=cache, stats=stats)
+                except ValueError as error: # invalid_puzzle, also from engines importing this module by name
+                    ng_solver = None
+                    result = {"id": puzzle_id, "status": "error", "error": "invalid puzzle: " + str(error)}
+            if ng_solver is not None and checkpoint_path is not None:
+                ng_solver.enable_checkpoints(checkpoint_path, checkpoint_interval)
+                ng_solver.checkpoint_info = {"batch_index": index}
+            if ng_solver is not None and max_solutions is not None:
+                solutions = ng_solver.count_solutions(max_solutions)
+                status = "unique" if len(solutions) == 1 else "multiple" if solutions else "unsolvable"
+                result = {"id": puzzle_id, "status": status, "solutions": len(solutions),
+                          "boards": [board_to_strings(solution) for solution in solutions]}
+                board = solutions[0] if solutions else ng_solver.board.to_lists()
+            elif ng_solver is not None:
+                if ng_solver is resumed:
+                    board = ng_solver.resume_solver(time_limit=time_limit, max_passes=max_passes)
+                else:
+                    board = ng_solver.run_solver(time_limit=time_limit, max_passes=max_passes)
+                status = "solved" if ng_solver.is_complete() else "incomplete"
+                result = {"id": puzzle_id, "status": status, "phase": ng_solver.phase,
+                          "board": board_to_strings(board)}
+                if ng_solver.stop_reason is not None:
+                    result.update(stop_reason=ng_solver.stop_reason, completion=ng_solver.completion())
+            if fmt == "json":
+                out_file.write(json.dumps(result) + "\n")
+            elif fmt != "none" and result["status"] != "error":
+                out_file.write(render_board(board, rows_hints, cols_hints, fmt))
+            elif fmt != "none":
+                sys.stderr.write("puzzle %s: %s\n" % (puzzle_id, result["error"]))
+            out_file.flush()
+            if checkpoint_path is not None:
+                write_checkpoint(checkpoint_path, {"stage": "done", "batch_index": index})
+        if resumed is not None and num_puzzles <= resume_index:
+            raise ValueError("checkpoint is of puzzle %d but the batch has %d puzzles" % (resume_index, num_puzzles))
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGUSR1, previous_handler)
+
+### print the board of a finished solve, or why there is none: the hints contradict each other,
+### or the solve was stopped before the board was complete
+def print_solution(ng_solver, fmt):
+    if ng_solver.phase == "unsolvable":
+        print("puzzle has no solution: the hints contradict each other\n")
+    elif ng_solver.phase == "incomplete":
+        print("puzzle not solved (%s), %.1f%% of squares determined\n"
+              % (ng_solver.stop_reason or "incomplete", ng_solver.completion()))
+    else:
+        ng_solver.print_board(fmt)
+
+### run solver interactively, or in batch mode on a puzzle file or stdin ("-")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Automatic nonogram solver")
+    parser.add_argument("--batch", metavar="FILE",
+                        help='solve puzzles from FILE ("-" for stdin), writing results to stdout')
+    parser.add_argument("--format", choices=BOARD_FORMATS, default=None,
+                        help="output format: json results per puzzle (batch default), ascii board with hints "
+                             "(interactive default), text grid, pbm image, or none")
+    parser.add_argument("--stats", action="store_true",
+                        help="write per-technique statistics as JSON to stderr once the batch is done")
+    parser.add_argument("--engine", choices=["python", "numpy", "parallel"], default="python",
+                        help="line solving engine for batch mode (numpy requires numpy, "
+                             "parallel solves the lines of each puzzle on all cores)")
+    parser.add_argument("--count-solutions", metavar="LIMIT", type=int, default=None,
+                        help="in batch mode, count solutions of each puzzle up to LIMIT (2 checks that "
+                             "each puzzle has exactly one)")
+    parser.add_argument("--time-limit", metavar="SECONDS", type=float, default=None,
+                        help="in batch mode, stop each puzzle after SECONDS and write the partial board")
+    parser.add_argument("--max-passes", metavar="N", type=int, default=None,
+                        help="in batch mode, stop each puzzle after N passes of line logic")
+    parser.add_argument("--checkpoint", metavar="FILE",
+                        help="write the state of the puzzle being solved to FILE every --checkpoint-interval "
+                             "seconds and on SIGUSR1")
+    parser.add_argument("--checkpoint-interval", metavar="SECONDS", type=float, default=60.0,
+                        help="seconds between checkpoints (default: 60)")
+    parser.add_argument("--resume", metavar="FILE",
+                        help="finish the solve saved in checkpoint FILE, then with --batch, the rest of the batch")
+    args = parser.parse_args(argv)
+    if args.count_solutions is not None and args.engine != "python":
+        parser.error("--count-solutions needs the python engine")
+    if args.checkpoint is not None and args.engine != "python":
+        parser.error("--checkpoint needs the python engine")
+    if (args.checkpoint is not None or args.resume) and args.count_solutions is not None:
+        parser.error("--checkpoint and --resume can't be used with --count-solutions")
+
+    stats = solver_stats() if args.stats else None
+    resume_state = None
+    if args.resume:
+        resume_state = read_checkpoint(args.resume)
+        if args.batch and "batch_index" not in resume_state:
+            parser.error("--resume with --batch needs a checkpoint written in batch mode")
+        if not args.batch and resume_state["stage"] == "done":
+            parser.error("the solve saved in %s is already finished" % args.resume)
+    solver_type = nonogram_solver
+    if args.engine == "numpy":
+        from nonogram_numpy import numpy_solver as solver_type
+    elif args.engine == "parallel":
+        from nonogram_parallel import parallel_solver as solver_type
+    if args.batch == "-":
+        solve_batch(sys.stdin, sys.stdout, stats=stats, solver_type=solver_type, fmt=args.format or "json",
+                    max_solutions=args.count_solutions, time_limit=args.time_limit, max_passes=args.max_passes,
+                    checkpoint_path=args.checkpoint, checkpoint_interval=args.checkpoint_interval,
+                    resume_state=resume_state)
+    elif args.batch:
+        with open(args.batch) as puzzle_file:
+            solve_batch(puzzle_file, sys.stdout, stats=stats, solver_type=solver_type, fmt=args.format or "json",
+                        max_solutions=args.count_solutions, time_limit=args.time_limit, max_passes=args.max_passes,
+                        checkpoint_path=args.checkpoint, checkpoint_interval=args.checkpoint_interval,
+                        resume_state=resume_state)
+    elif args.resume:
+        resumed = restore_checkpoint(resume_state, stats=stats)
+        if args.checkpoint is not None:
+            resumed.enable_checkpoints(args.checkpoint, args.checkpoint_interval, getattr(signal, "SIGUSR1", None))
+        resumed.resume_solver(time_limit=args.time_limit, max_passes=args.max_passes)
+        if args.checkpoint is not None:
+            write_checkpoint(args.checkpoint, {"stage": "done"})
+        print_solution(resumed, args.format or "ascii")
+    if stats is not None:
+        sys.stderr.write(stats.to_json() + "\n")
+    if not args.batch and not args.resume:
+        # repeatedly run nonogram solver, requesting user input for row and col hints
+        # (values/numbers from nonogram board)
+        while True:
+            try:
+                rows_hints, cols_hints = user_input()
+            except EOFError:
+                break
+            except ValueError as error: # a hint that isn't a number, e.g. "1,,2"
+                print("invalid hints: %s\n" % error)
+                continue
+            try:
+                ng_solver = nonogram_solver(rows_hints, cols_hints)
+            except invalid_puzzle as error:
+                print("invalid puzzle: %s\n" % error)
+                continue
+            ng_solver.run_solver()
+            print_solution(ng_solver, args.format or "ascii")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+### bulk solution verifier
+### checks submitted grids against row and col hints without solving. the grid is handled as
+### one string of "#" (painted) and "." (unpainted) squares, so rows and cols are slices of it
+### and the runs of a line come from one str.split, with no per-square python code
+
+SQUARE_CHARS = bytes.maketrans(b"\x00\x01", b".#") # 0/False and 1/True squares to characters
+
+### hints of a line string, [0] for a line with no painted squares
+def string_hints(line):
+    return list(map(len, line.replace(".", " ").split())) or [0]
+
+### grid as a list of row strings: rows may be strings of "#" and "." or lists of True and False
+### (or 1 and 0). returns None if a square is anything else
+def grid_strings(grid):
+    rows = []
+    for row in grid:
+        if not isinstance(row, str):
+            try:
+                row_bytes = bytes(row)
+            except (TypeError, ValueError):
+                return None
+            if row_bytes.translate(None, b"\x00\x01"):
+                return None
+            row = row_bytes.translate(SQUARE_CHARS).decode("ascii")
+        elif row.replace("#", "").replace(".", ""):
+            return None
+        rows.append(row)
+    return rows
+
+### check grid against rows_hints and cols_hints (with [0] for empty lines), returning up to max_mismatches lines whose
+### runs don't match their hints, rows before cols, as {"line": "row" or "col", "index": ...,
+### "expected": hints, "found": runs}. an empty list means the grid is a solution.
+### a grid of the wrong size or with unknown squares gives a single {"line": "grid", ...}
+def verify_grid(grid, rows_hints, cols_hints, max_mismatches=1):
+    rows = grid_strings(grid)
+    if rows is None:
+        return [{"line": "grid", "error": "squares must be painted or unpainted"}]
+    if len(rows) != len(rows_hints) or any(len(row) != len(cols_hints) for row in rows):
+        return [{"line": "grid", "error": "grid size doesn't match hints",
+                 "expected": [len(rows_hints), len(cols_hints)], "found": [len(rows), len(rows[0]) if rows else 0]}]
+
+    mismatches = []
+    squares = "".join(rows)
+    num_cols = len(cols_hints)
+    for line_idx, line_hints in enumerate(rows_hints):
+        found = string_hints(rows[line_idx])
+        if found != line_hints:
+            mismatches.append({"line": "row", "index": line_idx, "expected": line_hints, "found": found})
+            if len(mismatches) >= max_mismatches:
+                return mismatches
+    for line_idx, line_hints in enumerate(cols_hints):
+        found = string_hints(squares[line_idx::num_cols])
+        if found != line_hints:
+            mismatches.append({"line": "col", "index": line_idx, "expected": line_hints, "found": found})
+            if len(mismatches) >= max_mismatches:
+                return mismatches
+    return mismatches
+
+### verify one JSON line {"id": ..., "rows": [[...], ...], "cols": [[...], ...], "grid": [...]},
+### returning the result dict
+def verify_text(text, max_mismatches=1):
+    try:
+        submission = json.loads(text)
+        puzzle_id = submission.get("id")
+        mismatches = verify_grid(submission["grid"], submission["rows"], submission["cols"], max_mismatches)
+        result = {"id": puzzle_id, "status": "fail" if mismatches else "pass", "mismatches": mismatches}
+    except (ValueError, KeyError, TypeError, AttributeError) as error:
+        result = {"status": "error", "error": "invalid submission: " + repr(error)}
+    return result
+
+### verify_text for a worker process, task is (text, max_mismatches).
+### returns the status and the result as a JSON line
+def verify_task(task):
+    result = verify_text(*task)
+    return result["status"], json.dumps(result)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check submitted nonogram grids against their hints")
+    parser.add_argument("submissions", help='JSON lines of {"id", "rows", "cols", "grid"} ("-" for stdin)')
+    parser.add_argument("--max-mismatches", type=int, default=1, help="mismatched lines reported per grid")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--chunksize", type=int, default=256, help="grids sent to a worker at once")
+    args = parser.parse_args(argv)
+
+    submission_file = sys.stdin if args.submissions == "-" else open(args.submissions)
+    tasks = ((text, args.max_mismatches) for text in submission_file if text.strip())
+    counts = {"pass": 0, "fail": 0, "error": 0}
+    start_time = time.perf_counter()
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 else None
+    try:
+        results = pool.imap(verify_task, tasks, args.chunksize) if pool else map(verify_task, tasks)
+        for status, result_text in results:
+            sys.stdout.write(result_text + "\n")
+            counts[status] += 1
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+        if submission_file is not sys.stdin:
+            submission_file.close()
+    elapsed = time.perf_counter() - start_time
+    sys.stderr.write(json.dumps(dict(counts, elapsed=elapsed,
+                                     grids_per_sec=sum(counts.values()) / elapsed if elapsed else None)) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import io
+import itertools
+import json
+import os
+import random
+
+from nonogram_bench import image_hints, line_hints, random_image
+from nonogram_solver import (line_cache, line_runs, load_checkpoint, nonogram_solver, read_checkpoint, solve_batch,
+                             solve_line)
+
+### solve_line by enumerating every painted/unpainted arrangement of the line: the squares
+### shared by all arrangements that match line_hints and the known squares, or None if none do
+def brute_force_line(line_hints, line):
+    hints = [hint for hint in line_hints if hint > 0]
+    solved_line = None
+    for squares in itertools.product((True, False), repeat=len(line)):
+        if any(known != None and known != square for known, square in zip(line, squares)):
+            continue
+        if line_runs(squares) != hints:
+            continue
+        if solved_line is None:
+            solved_line = list(squares)
+        else:
+            solved_line = [known if known == square else None for known, square in zip(solved_line, squares)]
+    return solved_line
+
+### random hints for a line of length squares: usually those of a random image line, so they
+### fit, sometimes arbitrary runs that may not fit, and [0] for an empty line
+def random_hints(rng, length):
+    if rng.random() < 0.2:
+        hints = [rng.randint(1, length) for i in range(rng.randint(1, 3))]
+    else:
+        hints = line_runs([rng.random() < 0.5 for i in range(length)])
+    return hints or [0]
+
+### random known squares: each unknown, painted or unpainted
+def random_line(rng, length, known_fraction):
+    return [rng.choice((True, False)) if rng.random() < known_fraction else None for i in range(length)]
+
+def test_solve_line_matches_brute_force():
+    rng = random.Random(1)
+    for i in range(3000):
+        length = rng.randint(1, 10)
+        line_hints = random_hints(rng, length)
+        line = random_line(rng, length, rng.choice((0.0, 0.2, 0.5)))
+        assert solve_line(line_hints, line) == brute_force_line(line_hints, line), (line_hints, line)
+
+def test_solve_line_empty_lines():
+    for length in range(1, 7):
+        for line in itertools.product((None, True, False), repeat=length):
+            line = list(line)
+            assert solve_line([0], line) == brute_force_line([0], line), line
+
+def test_solve_line_keeps_input():
+    line = [None, True, None, None, False, None]
+    solve_line([2, 1], line)
+    assert line == [None, True, None, None, False, None]
+
+def test_update_hints_matches_fresh_solve():
+    rng = random.Random(2)
+    for puzzle_idx in range(60):
+        size = rng.choice((5, 10, 20, 30))
+        image = random_image(size, size, rng.choice((0.6, 0.7, 0.8)), puzzle_idx)
+        rows_hints, cols_hints = image_hints(image)
+        cache = line_cache() if puzzle_idx % 2 else None
+        ng_solver = nonogram_solver(rows_hints, cols_hints, cache=cache, track_provenance=puzzle_idx % 3 > 0)
+        ng_solver.run_solver(search=False)
+        # several edits in a row, each replayed on the board left by the one before
+        for edit_idx in range(4):
+            row, col = rng.randrange(size), rng.randrange(size)
+            image[row][col] = not image[row][col]
+            board = ng_solver.update_hints({row: line_hints(image[row])},
+                                           {col: line_hints([image_row[col] for image_row in image])}, search=False)
+            fresh_solver = nonogram_solver(*image_hints(image))
+            assert board == fresh_solver.run_solver(search=False), (puzzle_idx, edit_idx)
+            assert ng_solver.phase == fresh_solver.phase, (puzzle_idx, edit_idx)
+
+### nonogram_solver that asks for a checkpoint at its checkpoint_at-th line update during search
+class search_checkpoint_solver(nonogram_solver):
+    checkpoint_at = 1
+
+    def update_line(self):
+        if self.stage == "search":
+            self.checkpoint_at -= 1
+            if self.checkpoint_at == 0:
+                self.request_checkpoint()
+        super().update_line()
+
+### seeded puzzles that need search, as (rows_hints, cols_hints, board, line updates during search)
+def search_puzzles(count):
+    puzzles = []
+    for puzzle_idx in range(400):
+        size = (10, 12, 15)[puzzle_idx % 3]
+        rows_hints, cols_hints = image_hints(random_image(size, size, 0.5, "search-%d" % puzzle_idx))
+        ng_solver = search_checkpoint_solver(rows_hints, cols_hints)
+        ng_solver.checkpoint_at = -1 # count line updates during search without a checkpoint
+        board = ng_solver.run_solver(time_limit=1)
+        if ng_solver.phase == "search" and ng_solver.stop_reason is None and ng_solver.checkpoint_at < -2:
+            puzzles.append((rows_hints, cols_hints, board, -1 - ng_solver.checkpoint_at))
+            if len(puzzles) == count:
+                break
+    return puzzles
+
+def test_checkpoint_resume_during_search(tmp_path):
+    path = str(tmp_path / "state.json")
+    rng = random.Random(3)
+    for rows_hints, cols_hints, board, search_updates in search_puzzles(10):
+        ng_solver = search_checkpoint_solver(rows_hints, cols_hints)
+        # the checkpoint is written before the next line update, so not after the last one
+        ng_solver.checkpoint_at = rng.randint(1, search_updates - 1)
+        ng_solver.enable_checkpoints(path)
+        assert ng_solver.run_solver() == board
+        assert ng_solver.checkpoint_at <= 0
+        with open(path) as checkpoint_file:
+            assert json.load(checkpoint_file)["stage"] == "search"
+        resumed = load_checkpoint(path)
+        assert resumed.resume_solver() == board
+        assert resumed.phase == "search"
+        os.remove(path)
+
+def test_checkpoint_resume_batch(tmp_path):
+    path = str(tmp_path / "state.json")
+    puzzles = search_puzzles(3)
+    batch_text = "".join(json.dumps({"id": i, "rows": rows_hints, "cols": cols_hints}) + "\n"
+                         for i, (rows_hints, cols_hints, board, search_updates) in enumerate(puzzles))
+    out_file = io.StringIO()
+    solve_batch(io.StringIO(batch_text), out_file)
+    results = out_file.getvalue().splitlines()
+
+    # checkpoint the middle puzzle during search, then resume the batch from it
+    rows_hints, cols_hints, board, search_updates = puzzles[1]
+    ng_solver = search_checkpoint_solver(rows_hints, cols_hints)
+    ng_solver.checkpoint_at = search_updates // 2
+    ng_solver.enable_checkpoints(path)
+    ng_solver.checkpoint_info = {"batch_index": 1}
+    ng_solver.run_solver()
+    out_file = io.StringIO()
+    solve_batch(io.StringIO(batch_text), out_file, checkpoint_path=path, resume_state=read_checkpoint(path))
+    assert out_file.getvalue().splitlines() == results[1:]
+
+    # the finished batch leaves a "done" state, from which nothing is solved again
+    assert read_checkpoint(path) == {"stage": "done", "batch_index": len(puzzles) - 1}
+    out_file = io.StringIO()
+    solve_batch(io.StringIO(batch_text), out_file, resume_state=read_checkpoint(path))
+    assert out_file.getvalue() == ""